@@ -1,10 +1,21 @@
+import collections
+import math
 import numpy as np
 
 class RandomWalker():
-    def __init__(self):
+    # Heading turn() draws: "grid" (one of the four cardinal directions,
+    # Part 2) or "continuous" (any angle, Part 1), see drawHeadings
+    turning = "grid"
+
+    def __init__(self, rng=None):
+        # Random source (an np.random.Generator, or None for np.random),
+        # looked up when used so walkers stay picklable
+        self.rng = rng
+        rng = randomSource(rng)
+
         self.x = 0.0 # X-position
         self.y = 0.0 # Y-position
-        self.o = np.random.choice([0, 0.5, 1, 1.5])*np.pi # Orientation
+        self.o = rng.choice([0, 0.5, 1, 1.5])*np.pi # Orientation
         self.v = 1.0 # Velocity
 
         # A simple walker that starts at the origin and moves in one
@@ -16,22 +27,29 @@ class RandomWalker():
         self.y += self.v*np.sin(self.o)
     
     def turn(self):
-        # self.o = np.random.random()*2*np.pi # Part 1
-        # Randomly choose between four grid-aligned orientations
-        self.o = np.random.choice([0, 0.5, 1, 1.5])*np.pi # Grid-like movement
+        # Randomly choose a new orientation as set by turning: one of four
+        # grid-aligned orientations, or any angle for Part 1
+        self.o = drawHeadings(randomSource(self.rng), self.turning)
 
 
 class TrulyRandomWalker():
-    def __init__(self, duration):
+    turning = "grid" # See RandomWalker.turning
+
+    def __init__(self, duration, rng=None):
+        # Random source (an np.random.Generator, or None for np.random),
+        # looked up when used so walkers stay picklable
+        self.rng = rng
+        rng = randomSource(rng)
+
         # Start at a random point within [-duration, duration]
-        self.x = np.random.randint(-duration, duration + 1) # X-position
-        self.y = np.random.randint(-duration, duration + 1) # Y-position
+        self.x = randomIntegers(rng, -duration, duration + 1) # X-position
+        self.y = randomIntegers(rng, -duration, duration + 1) # Y-position
         
         # Orientation chosen from the four cardinal directions
-        self.o = np.random.choice([0, 0.5, 1, 1.5])*np.pi # Orientation
+        self.o = rng.choice([0, 0.5, 1, 1.5])*np.pi # Orientation
         
         # Random speed scaled based on simulation duration
-        self.v = np.random.randint(1, np.sqrt(np.sqrt(duration + 1) + 1) + 1) # Velocity
+        self.v = randomIntegers(rng, 1, np.sqrt(np.sqrt(duration + 1) + 1) + 1) # Velocity
 
     def step(self):
         # Move forward using velocity and orientation
@@ -39,37 +57,44 @@ class TrulyRandomWalker():
         self.y += self.v*np.sin(self.o)
 
     def turn(self):
-        # Grid-based turning, same as RandomWalker
-        self.o = np.random.choice([0, 0.5, 1, 1.5])*np.pi # Grid-like movement
+        # Same turning as RandomWalker
+        self.o = drawHeadings(randomSource(self.rng), self.turning)
 
 
 class RandomRandomWalker():
-    def __init__(self, duration):
+    turning = "grid" # See RandomWalker.turning
+
+    def __init__(self, duration, rng=None):
+        # Random source (an np.random.Generator, or None for np.random),
+        # looked up when used so walkers stay picklable
+        self.rng = rng
+        rng = randomSource(rng)
+
         # Generate two possible x-values: 0 and a random value
         self.xs = []
         self.xs.append(0.0)
-        self.xs.append(np.random.randint(-duration, duration + 1))
+        self.xs.append(randomIntegers(rng, -duration, duration + 1))
 
         # Same for y-values
         self.ys = []
         self.ys.append(0.0)
-        self.ys.append(np.random.randint(-duration, duration + 1))
+        self.ys.append(randomIntegers(rng, -duration, duration + 1))
 
         # Two orientations: 0 radians or a random cardinal direction
         self.os = []
         self.os.append(0.0)
-        self.os.append(np.random.choice([0, 0.5, 1, 1.5])*np.pi)
+        self.os.append(rng.choice([0, 0.5, 1, 1.5])*np.pi)
 
         # Two velocities: base speed or a random one
         self.vs = []
         self.vs.append(1.0)
-        self.vs.append(np.random.randint(1, np.sqrt(np.sqrt(duration + 1) + 1) + 1))
+        self.vs.append(randomIntegers(rng, 1, np.sqrt(np.sqrt(duration + 1) + 1) + 1))
 
         # Randomly pick between the two possible values for each property
-        self.x = self.xs[np.random.choice([0, 1])] # X-position
-        self.y = self.ys[np.random.choice([0, 1])] # Y-position
-        self.o = self.os[np.random.choice([0, 1])] # Orientation
-        self.v = self.vs[np.random.choice([0, 1])] # Velocity
+        self.x = self.xs[rng.choice([0, 1])] # X-position
+        self.y = self.ys[rng.choice([0, 1])] # Y-position
+        self.o = self.os[rng.choice([0, 1])] # Orientation
+        self.v = self.vs[rng.choice([0, 1])] # Velocity
 
         # This walker randomly selects one of two possible initialization states.
 
@@ -79,11 +104,40 @@ class RandomRandomWalker():
         self.y += self.v*np.sin(self.o)
 
     def turn(self):
-        # Grid-like turning similar to the other walkers
-        self.o = np.random.choice([0, 0.5, 1, 1.5])*np.pi # Grid-like movement
+        # Same turning as the other walkers
+        self.o = drawHeadings(randomSource(self.rng), self.turning)
+
+
+class WalkerPopulation():
+    def __init__(self, focus, population, rng=None):
+        # Struct-of-arrays copy of one walker, repeated for every bot so the
+        # whole population can be advanced with a single array operation.
+        self.x = np.full(population, float(focus.x)) # X-positions
+        self.y = np.full(population, float(focus.y)) # Y-positions
+        self.o = np.full(population, float(focus.o)) # Orientations
+        self.v = np.full(population, float(focus.v)) # Velocities
+
+        # Random source for turning (an np.random.Generator, or None for
+        # np.random), and the turning mode of the walker's class (see
+        # RandomWalker)
+        self.rng = rng
+        self.turning = focus.turning
+
+    def step(self):
+        # Move every walker forward in the direction of its orientation
+        self.x += self.v*np.cos(self.o)
+        self.y += self.v*np.sin(self.o)
+
+    def turn(self):
+        # The focus walker's turning for the whole population at once
+        self.o = drawHeadings(randomSource(self.rng), self.turning, len(self.o))
 
 
 class Braitenberg():
+    # Fixed attribute layout instead of a per-instance __dict__
+    __slots__ = ("x", "y", "o", "v", "r", "ls", "rs", "lm", "rm", "a",
+                 "rsX", "rsY", "lsX", "lsY", "tg", "vg", "sg", "vk", "tk")
+
     def __init__(self):
         self.x = 0.0 # X-position
         self.y = 0.0 # Y-position
@@ -113,6 +167,10 @@ class Braitenberg():
         self.vg = 1/10.0 # Velocity gain
         self.sg = 1/10.0 # Sensor gain
 
+        # Scales applied to the velocity and turning gains think() derives
+        self.vk = 1.0 # Velocity gain scale
+        self.tk = 1.0 # Turning gain scale
+
     def move(self):
         # Adjust orientation based on difference in motor outputs
         self.o += self.tg * (self.rm - self.lm)
@@ -133,10 +191,20 @@ class Braitenberg():
         self.lsX = self.x + self.r*np.cos(self.o-self.a)
         self.lsY = self.y + self.r*np.sin(self.o-self.a)
     
+    def place(self, x, y):
+        # Puts the body at (x, y) and moves the sensors along with it
+        self.x = x
+        self.y = y
+        self.rsX = self.x + self.r*np.cos(self.o+self.a)
+        self.rsY = self.y + self.r*np.sin(self.o+self.a)
+        self.lsX = self.x + self.r*np.cos(self.o-self.a)
+        self.lsY = self.y + self.r*np.sin(self.o-self.a)
+
     def sense(self, light, size):
-        # Compute distances from sensors to light source
-        self.ls = self.sg*np.sqrt((self.lsX - light.x)**2 + (self.lsY - light.y)**2)
-        self.rs = self.sg*np.sqrt((self.rsX - light.x)**2 + (self.rsY - light.y)**2)
+        # Compute distances from sensors to light source (a LightSource, or
+        # a LightField of many lights)
+        self.ls = self.sg*light.distance(self.lsX, self.lsY)
+        self.rs = self.sg*light.distance(self.rsX, self.rsY)
 
         # Clip readings to avoid excessively large sensor values
         self.ls = np.clip(self.ls, 0, size)
@@ -154,11 +222,11 @@ class Braitenberg():
 
         # Velocity gain based on total duration
         self.vg = np.log10(max(duration, 10))
-        self.vg = np.clip(self.vg, 0.0, 100.0)/5
+        self.vg = np.clip(self.vg, 0.0, 100.0)/5*self.vk
 
         # Turning gain depends on difference in motor outputs
         self.tg
-        self.tg = np.clip(np.log10(max(duration, 10)), -250.0, 250.0)*(1 + np.abs(self.rm - self.lm))
+        self.tg = np.clip(np.log10(max(duration, 10)), -250.0, 250.0)*(1 + np.abs(self.rm - self.lm))*self.tk
 
         # Stop movement if too close to the light
         if self.ls < 0.5 or self.rs < 0.5:
@@ -181,7 +249,8 @@ class Braitenberg():
             self.vg = self.ls*self.rs
         
         # Turning gain scaled by duration
-        self.tg = self.vg*int(np.sqrt(duration))
+        self.tg = self.vg*int(np.sqrt(duration))*self.tk
+        self.vg = self.vg*self.vk
         
         # Stop motion if too close
         if self.ls < 0.5 or self.rs < 0.5:
@@ -190,6 +259,283 @@ class Braitenberg():
             self.vg = 0.0
             self.tg = 0.0
 
+    def advance(self, light, duration, steps, controller="think", window=0):
+        # Fused sense → think → move loop, equivalent to calling sense(),
+        # think() or thinkWorldTravel() and move() steps times. The state is
+        # kept in plain local floats and math functions, and values that only
+        # depend on duration are computed once. Returns the x and y positions
+        # after every step and leaves the vehicle in its final state.
+        #
+        # A step only depends on x, y and o, so once a step ends in a state
+        # seen before the rest of the run repeats what followed it. Halted
+        # vehicles (the stop rule makes move() a no-op) are always caught.
+        # Orbit detection is opt-in: with window > 0, an orbit of period up
+        # to window steps is caught too, but only once (x, y, o) repeats
+        # exactly, bit for bit; an orbit that drifts by rounding error is
+        # simulated to the end. The remaining positions are then filled in
+        # bulk. Also returns the (step, period) the run converged at, or None.
+        size = float(int(np.sqrt(duration)))
+        root = int(np.sqrt(duration))
+        worldTravel = controller == "thinkWorldTravel"
+
+        # Gains think() derives from duration alone
+        thinkVg = float(np.clip(np.log10(max(duration, 10)), 0.0, 100.0)/5*self.vk)
+        thinkTg = float(np.clip(np.log10(max(duration, 10)), -250.0, 250.0))
+
+        lightX = float(light.x)
+        lightY = float(light.y)
+        x, y, o = float(self.x), float(self.y), float(self.o)
+        lsX, lsY, rsX, rsY = float(self.lsX), float(self.lsY), float(self.rsX), float(self.rsY)
+        ls, rs, lm, rm = self.ls, self.rs, self.lm, self.rm
+        v, tg, vg = self.v, self.tg, self.vg
+        r, a, sg = self.r, self.a, self.sg
+        vk, tk = self.vk, self.tk
+        cos, sin, sqrt = math.cos, math.sin, math.sqrt
+
+        xs = [0.0]*steps
+        ys = [0.0]*steps
+
+        converged = None
+        seen = {} # (x, y, o) → latest step it was reached at
+        recent = collections.deque() # Full states of the last window steps
+
+        for i in range(steps):
+            # Sense: clipped distances from the sensors to the light
+            ls = min(max(sg*sqrt((lsX - lightX)**2 + (lsY - lightY)**2), 0.0), size)
+            rs = min(max(sg*sqrt((rsX - lightX)**2 + (rsY - lightY)**2), 0.0), size)
+
+            # Think: closer light → smaller distance → bigger motor value
+            lm = 1.0/ls if ls else math.inf
+            rm = 1.0/rs if rs else math.inf
+            if worldTravel:
+                lm = min(lm, 5.0)
+                rm = min(rm, 5.0)
+                vg = (lm + rm)/root
+                if int(lm) == int(rm):
+                    vg = ls*rs
+                tg = vg*root*tk
+                vg = vg*vk
+            else:
+                lm = min(lm, 10.0)
+                rm = min(rm, 10.0)
+                vg = thinkVg
+                tg = thinkTg*(1 + abs(rm - lm))*tk
+
+            # Stop movement if too close to the light
+            halted = ls < 0.5 or rs < 0.5
+            if halted:
+                lm = rm = vg = tg = 0.0
+
+            # Move
+            o += tg*(rm - lm)
+            v = vg*(lm + rm)
+            x += v*cos(o)
+            y += v*sin(o)
+            rsX = x + r*cos(o + a)
+            rsY = y + r*sin(o + a)
+            lsX = x + r*cos(o - a)
+            lsY = y + r*sin(o - a)
+
+            xs[i] = x
+            ys[i] = y
+
+            if halted:
+                # The vehicle stayed put and will on every later step
+                converged = (i, 1)
+                xs[i+1:] = [x]*(steps - i - 1)
+                ys[i+1:] = [y]*(steps - i - 1)
+                break
+
+            if window:
+                key = (x, y, o)
+                recent.append((x, y, o, lsX, lsY, rsX, rsY, ls, rs, lm, rm, v, tg, vg))
+                if key in seen:
+                    # Steps seen[key]+1..i repeat from here on
+                    period = i - seen[key]
+                    converged = (i, period)
+                    cycle = list(recent)[-period:]
+                    rest = steps - i - 1
+                    xs[i+1:] = ([state[0] for state in cycle]*(rest//period + 1))[:rest]
+                    ys[i+1:] = ([state[1] for state in cycle]*(rest//period + 1))[:rest]
+                    x, y, o, lsX, lsY, rsX, rsY, ls, rs, lm, rm, v, tg, vg = cycle[(rest - 1) % period]
+                    break
+
+                seen[key] = i
+                if len(recent) > window:
+                    old = recent.popleft()
+                    if seen.get(old[:3]) == i - window:
+                        del seen[old[:3]]
+
+        self.x, self.y, self.o, self.v = x, y, o, v
+        self.lsX, self.lsY, self.rsX, self.rsY = lsX, lsY, rsX, rsY
+        self.ls, self.rs, self.lm, self.rm = ls, rs, lm, rm
+        self.tg, self.vg = tg, vg
+
+        return np.array(xs), np.array(ys), converged
+
+
+class BraitenbergBatch():
+    def __init__(self, count, rng=None, o=None):
+        # Struct-of-arrays version of Braitenberg: every attribute holds one
+        # value per vehicle so a whole batch senses, thinks and moves at once.
+        # Orientations are drawn from rng unless given as o.
+        self.x = np.zeros(count) # X-positions
+        self.y = np.zeros(count) # Y-positions
+        self.o = randomSource(rng).choice([0, 0.5, 1, 1.5], size=count)*np.pi if o is None else np.array(o, dtype=float) # Orientations
+        self.v = np.ones(count) # Velocities
+
+        self.r = 1.0 # Size (radius)
+
+        # Sensor readings
+        self.ls = np.zeros(count) # Left Sensors
+        self.rs = np.zeros(count) # Right Sensors
+
+        # Motor activations
+        self.lm = np.zeros(count) # Left Motors
+        self.rm = np.zeros(count) # Right Motors
+
+        self.a = np.pi/2 # Angle offset of sensors
+
+        # Initial global sensor positions
+        self.rsX = self.r*np.cos(self.o+self.a) # X-positions of right sensors
+        self.rsY = self.r*np.sin(self.o+self.a) # Y-positions of right sensors
+        self.lsX = self.r*np.cos(self.o-self.a) # X-positions of left sensors
+        self.lsY = self.r*np.sin(self.o-self.a) # Y-positions of left sensors
+
+        # Gains controlling robot sensitivity
+        self.tg = np.full(count, 1/10.0) # Turning gains
+        self.vg = np.full(count, 1/10.0) # Velocity gains
+        self.sg = np.full(count, 1/10.0) # Sensor gains
+
+        # Scales applied to the velocity and turning gains think() derives
+        self.vk = np.ones(count) # Velocity gain scales
+        self.tk = np.ones(count) # Turning gain scales
+
+    def __len__(self):
+        return len(self.x)
+
+    def repeat(self, count):
+        # New batch where every vehicle appears count times in a row, used to
+        # pair each vehicle with several lights.
+        batch = BraitenbergBatch.__new__(BraitenbergBatch)
+        for name, value in vars(self).items():
+            if isinstance(value, np.ndarray):
+                value = np.repeat(value, count)
+            setattr(batch, name, value)
+        return batch
+
+    def take(self, index):
+        # New batch of the vehicles selected by index (mask or positions)
+        batch = BraitenbergBatch.__new__(BraitenbergBatch)
+        for name, value in vars(self).items():
+            if isinstance(value, np.ndarray):
+                value = value[index]
+            setattr(batch, name, value)
+        return batch
+
+    def put(self, index, batch):
+        # Writes the state of batch back into the vehicles selected by index
+        for name, value in vars(batch).items():
+            if isinstance(value, np.ndarray):
+                getattr(self, name)[index] = value
+
+    @staticmethod
+    def concatenate(batches):
+        # Joins several batches into one, keeping their order
+        batch = BraitenbergBatch.__new__(BraitenbergBatch)
+        for name, value in vars(batches[0]).items():
+            if isinstance(value, np.ndarray):
+                value = np.concatenate([getattr(other, name) for other in batches])
+            setattr(batch, name, value)
+        return batch
+
+    def place(self, x, y):
+        # Puts the bodies at (x, y) and moves the sensors along with them
+        self.x = np.array(x, dtype=float)
+        self.y = np.array(y, dtype=float)
+        self.rsX = self.x + self.r*np.cos(self.o+self.a)
+        self.rsY = self.y + self.r*np.sin(self.o+self.a)
+        self.lsX = self.x + self.r*np.cos(self.o-self.a)
+        self.lsY = self.y + self.r*np.sin(self.o-self.a)
+
+    def move(self):
+        # Same update as Braitenberg.move, applied to every vehicle
+        self.o += self.tg * (self.rm - self.lm)
+        self.v = self.vg * (self.lm + self.rm)
+
+        # Update body positions
+        self.x += self.v*np.cos(self.o)
+        self.y += self.v*np.sin(self.o)
+
+        # Update sensor positions after movement
+        self.rsX = self.x + self.r*np.cos(self.o+self.a)
+        self.rsY = self.y + self.r*np.sin(self.o+self.a)
+        self.lsX = self.x + self.r*np.cos(self.o-self.a)
+        self.lsY = self.y + self.r*np.sin(self.o-self.a)
+
+    def sense(self, lightX, lightY, size):
+        # Distances from sensors to each vehicle's own light source. Squares
+        # go through float_power so they round like the scalar ** in sense.
+        self.ls = self.sg*np.sqrt(np.float_power(self.lsX - lightX, 2) + np.float_power(self.lsY - lightY, 2))
+        self.rs = self.sg*np.sqrt(np.float_power(self.rsX - lightX, 2) + np.float_power(self.rsY - lightY, 2))
+
+        # Clip readings to avoid excessively large sensor values
+        self.ls = np.clip(self.ls, 0, size)
+        self.rs = np.clip(self.rs, 0, size)
+
+    def senseField(self, field, size):
+        # Distances from sensors to a shared LightField, one query per sensor
+        self.ls = np.clip(self.sg*field.distance(self.lsX, self.lsY), 0, size)
+        self.rs = np.clip(self.sg*field.distance(self.rsX, self.rsY), 0, size)
+
+    def think(self, duration):
+        # Same sensor → motor mapping as Braitenberg.think
+        with np.errstate(divide="ignore"):
+            self.lm = 1.0 / (self.ls)
+            self.rm = 1.0 / (self.rs)
+
+        # Clamp to prevent blowing up
+        self.lm = np.clip(self.lm, 0.0, 10.0)
+        self.rm = np.clip(self.rm, 0.0, 10.0)
+
+        # Velocity gain based on total duration
+        vg = np.log10(max(duration, 10))
+        self.vg = np.clip(vg, 0.0, 100.0)/5*self.vk
+
+        # Turning gain depends on difference in motor outputs
+        self.tg = np.clip(np.log10(max(duration, 10)), -250.0, 250.0)*(1 + np.abs(self.rm - self.lm))*self.tk
+
+        # Stop movement if too close to the light
+        self.halt()
+
+    def thinkWorldTravel(self, duration):
+        # Same sensor → motor mapping as Braitenberg.thinkWorldTravel
+        with np.errstate(divide="ignore"):
+            self.lm = 1.0 / (self.ls)
+            self.rm = 1.0 / (self.rs)
+        self.lm = np.clip(self.lm, 0.0, 5.0)
+        self.rm = np.clip(self.rm, 0.0, 5.0)
+
+        # Velocity based on motor symmetry
+        self.vg = (self.lm + self.rm) / int(np.sqrt(duration))
+        same = np.trunc(self.lm) == np.trunc(self.rm)
+        self.vg = np.where(same, self.ls*self.rs, self.vg)
+
+        # Turning gain scaled by duration
+        self.tg = self.vg*int(np.sqrt(duration))*self.tk
+        self.vg = self.vg*self.vk
+
+        # Stop motion if too close
+        self.halt()
+
+    def halt(self):
+        # Zero motors and gains of every vehicle with a sensor next to its light
+        stop = (self.ls < 0.5) | (self.rs < 0.5)
+        self.lm = np.where(stop, 0.0, self.lm)
+        self.rm = np.where(stop, 0.0, self.rm)
+        self.vg = np.where(stop, 0.0, self.vg)
+        self.tg = np.where(stop, 0.0, self.tg)
+
 
 class LightSource():
     def __init__(self, size):
@@ -200,4 +546,149 @@ class LightSource():
         # Ensure the light does not spawn too close to the origin
         while (np.sqrt(self.x**2 + self.y**2) <= 1):
             self.x = np.random.randint(1-size, size)
-            self.y = np.random.randint(1-size, size)
\ No newline at end of file
+            self.y = np.random.randint(1-size, size)
+
+    def distance(self, x, y):
+        # Euclidean distance from (x, y) to the light
+        return np.sqrt((x - self.x)**2 + (y - self.y)**2)
+
+
+class LightField():
+    def __init__(self, lightX, lightY, cutoff, mode="nearest"):
+        # Many lights sensed together. Only lights within cutoff of a sensor
+        # count, and they are found through a uniform grid of cutoff-sized
+        # cells, so a query only looks at the 3 × 3 cells around it instead
+        # of scanning every light. mode is "nearest" (distance to the
+        # closest light) or "summed" (the distance whose 1/d equals the sum
+        # of 1/d over all lights in range, i.e. summed intensity).
+        self.x = np.asarray(lightX, dtype=float)
+        self.y = np.asarray(lightY, dtype=float)
+        self.cutoff = float(cutoff)
+        self.mode = mode
+
+        # Lights sorted by cell, with the [start, end) slice of every cell
+        keys = self.cellKey(np.floor(self.x/self.cutoff), np.floor(self.y/self.cutoff))
+        self.order = np.argsort(keys, kind="stable")
+        self.keys, self.starts, counts = np.unique(keys[self.order], return_index=True, return_counts=True)
+        self.ends = self.starts + counts
+
+        # Same grid as plain Python lists, for single-point queries
+        self.buckets = {}
+        for x, y in zip(self.x.tolist(), self.y.tolist()):
+            self.buckets.setdefault((math.floor(x/self.cutoff), math.floor(y/self.cutoff)), []).append((x, y))
+
+    @staticmethod
+    def random(count, size, cutoff, mode="nearest", rng=None):
+        # Field of count lights placed like LightSource, drawn in bulk
+        lightX, lightY = placeLights(count, size, rng)
+        return LightField(lightX, lightY, cutoff, mode)
+
+    @staticmethod
+    def cellKey(cellX, cellY):
+        # One integer per grid cell
+        return cellX.astype(np.int64)*2**32 + (cellY.astype(np.int64) + 2**31)
+
+    def __len__(self):
+        return len(self.x)
+
+    def candidates(self, x, y):
+        # (query, light) index pairs for every light in the 3 × 3 block of
+        # cells around each query point
+        queries = [np.zeros(0, dtype=int)]
+        lights = [np.zeros(0, dtype=int)]
+        if len(self.keys) == 0:
+            return queries[0], lights[0]
+
+        cellX = np.floor(x/self.cutoff)
+        cellY = np.floor(y/self.cutoff)
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                key = self.cellKey(cellX + dx, cellY + dy)
+                slot = np.minimum(np.searchsorted(self.keys, key), len(self.keys) - 1)
+                query = np.nonzero(self.keys[slot] == key)[0]
+                start = self.starts[slot[query]]
+                count = self.ends[slot[query]] - start
+
+                # Expand each matching cell into its lights
+                offset = np.arange(count.sum()) - np.repeat(np.cumsum(count) - count, count)
+                queries.append(np.repeat(query, count))
+                lights.append(self.order[np.repeat(start, count) + offset])
+
+        return np.concatenate(queries), np.concatenate(lights)
+
+    def pointDistance(self, x, y):
+        # distance() for a single point, without NumPy overhead
+        cellX = math.floor(x/self.cutoff)
+        cellY = math.floor(y/self.cutoff)
+        nearest = math.inf
+        intensity = 0.0
+
+        for i in (cellX - 1, cellX, cellX + 1):
+            for j in (cellY - 1, cellY, cellY + 1):
+                for lightX, lightY in self.buckets.get((i, j), ()):
+                    d = math.sqrt((x - lightX)**2 + (y - lightY)**2)
+                    if d <= self.cutoff:
+                        nearest = min(nearest, d)
+                        intensity += 1.0/d if d else math.inf
+
+        if self.mode == "summed":
+            return 1.0/intensity if intensity else math.inf
+        return nearest
+
+    def distance(self, x, y):
+        # Effective distance from each (x, y) to the field, inf when no light
+        # is within cutoff. Accepts scalars or arrays of query points.
+        if np.ndim(x) == 0:
+            return self.pointDistance(float(x), float(y))
+
+        x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+
+        query, light = self.candidates(x, y)
+        d = np.sqrt((x[query] - self.x[light])**2 + (y[query] - self.y[light])**2)
+        inRange = d <= self.cutoff
+        query = query[inRange]
+        d = d[inRange]
+
+        if self.mode == "summed":
+            intensity = np.zeros(len(x))
+            with np.errstate(divide="ignore"):
+                np.add.at(intensity, query, 1.0/d)
+                result = 1.0/intensity
+        else:
+            result = np.full(len(x), np.inf)
+            np.minimum.at(result, query, d)
+
+        return result
+
+def randomSource(rng):
+    # Random source to draw from: rng itself, or np.random for None, the
+    # default of every rng parameter
+    return np.random if rng is None else rng
+
+def drawHeadings(rng, turning, size=None):
+    # Orientations drawn by a walker's turn() under its turning mode
+    if turning == "continuous":
+        return rng.random(size)*2*np.pi # Part 1
+    return rng.choice([0, 0.5, 1, 1.5], size=size)*np.pi # Grid-like movement
+
+def randomIntegers(rng, low, high, size=None):
+    # Draws integers in [low, high) from np.random or an np.random.Generator
+    if hasattr(rng, "integers"):
+        return rng.integers(low, high, size=size)
+    return rng.randint(low, high, size=size)
+
+def placeLights(count, size, rng=None):
+    # Bulk version of LightSource: count light positions drawn from the
+    # same square, redrawing any that land too close to the origin.
+    rng = randomSource(rng)
+    lightX = randomIntegers(rng, 1-size, size, count)
+    lightY = randomIntegers(rng, 1-size, size, count)
+
+    close = np.sqrt(lightX**2 + lightY**2) <= 1
+    while close.any():
+        lightX[close] = randomIntegers(rng, 1-size, size, close.sum())
+        lightY[close] = randomIntegers(rng, 1-size, size, close.sum())
+        close = np.sqrt(lightX**2 + lightY**2) <= 1
+
+    return lightX, lightY
\ No newline at end of file
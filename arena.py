@@ -0,0 +1,213 @@
+import math
+import agent
+import numpy as np
+
+# Sensor reading below which think() halts a vehicle
+STOP = 0.5
+
+class SpatialHash():
+    def __init__(self, cell):
+        # Buckets ids by the square grid cell of side cell they sit in
+        self.cell = cell
+        self.cells = {} # (cell x, cell y) → set of ids
+        self.keys = {}  # id → (cell x, cell y)
+
+    def key(self, x, y):
+        return (math.floor(x/self.cell), math.floor(y/self.cell))
+
+    def update(self, id, x, y):
+        # Moves id to the cell of (x, y), touching the buckets only when the
+        # cell actually changed. Returns whether it did.
+        key = self.key(x, y)
+        old = self.keys.get(id)
+        if old == key:
+            return False
+
+        if old is not None:
+            self.remove(id)
+        self.cells.setdefault(key, set()).add(id)
+        self.keys[id] = key
+        return True
+
+    def remove(self, id):
+        key = self.keys.pop(id)
+        members = self.cells[key]
+        members.discard(id)
+        if not members:
+            del self.cells[key]
+
+    def near(self, x, y, radius):
+        # Ids in every cell that overlaps the square of half-width radius
+        # around (x, y); callers still check the exact distance
+        cellX, cellY = self.key(x, y)
+        reach = math.ceil(radius/self.cell)
+        ids = []
+        for i in range(cellX - reach, cellX + reach + 1):
+            for j in range(cellY - reach, cellY + reach + 1):
+                ids.extend(self.cells.get((i, j), ()))
+        return ids
+
+
+class ArenaView():
+    def __init__(self, arena, xs, ys):
+        # What one vehicle senses: the arena's light plus, as emitters, the
+        # neighbors listed in self.neighbors (positions from xs, ys). It
+        # offers the same distance() as agent.LightSource, so sense() runs
+        # unchanged.
+        self.arena = arena
+        self.xs = xs
+        self.ys = ys
+        self.neighbors = []
+
+    def distance(self, x, y):
+        arena = self.arena
+        light = math.inf if arena.light is None else float(arena.light.distance(x, y))
+
+        if arena.mode == "summed":
+            # 1/d of the light plus 1/d of every neighbor in range
+            intensity = 1.0/light if light else math.inf
+            for j in self.neighbors:
+                d = math.sqrt((x - self.xs[j])**2 + (y - self.ys[j])**2)
+                if d <= arena.radius:
+                    intensity += 1.0/d if d else math.inf
+            return 1.0/intensity if intensity else math.inf
+
+        # Distance to the nearest emitter in range
+        nearest = light
+        for j in self.neighbors:
+            d = math.sqrt((x - self.xs[j])**2 + (y - self.ys[j])**2)
+            if d <= arena.radius and d < nearest:
+                nearest = d
+        return nearest
+
+
+class Arena():
+    def __init__(self, vehicles, light=None, radius=10.0, mode="nearest", emitters=True, obstacles=False):
+        # Many agent.Braitenberg vehicles sharing one space. With emitters,
+        # every vehicle also senses the others within radius as lights
+        # (nearest or summed, like agent.LightField); they steer it, but
+        # only the arena's light can trigger the stop rule, so a vehicle
+        # never halts for a neighbor. With obstacles, a move that creates
+        # or deepens an overlap with another vehicle is undone.
+        # Neighbor queries go through a spatial hash with cells of size
+        # radius, so a step costs about the same per vehicle at any count.
+        self.vehicles = vehicles
+        self.light = light # LightSource, LightField or None
+        self.radius = radius
+        self.mode = mode
+        self.emitters = emitters
+        self.obstacles = obstacles
+
+        self.hash = SpatialHash(radius)
+        for i, vehicle in enumerate(vehicles):
+            self.hash.update(i, vehicle.x, vehicle.y)
+
+        # Number of times a vehicle changed hash cell
+        self.rehashed = 0
+
+    def step(self, duration, controller="think"):
+        # One synchronous step: every vehicle senses the positions at the
+        # start of the step, thinks, then all of them move
+        size = int(np.sqrt(duration))
+        xs = [vehicle.x for vehicle in self.vehicles]
+        ys = [vehicle.y for vehicle in self.vehicles]
+        view = ArenaView(self, xs, ys)
+
+        for i, vehicle in enumerate(self.vehicles):
+            if self.emitters:
+                # Sensors sit r away from the body, so look a little further
+                view.neighbors = [j for j in self.hash.near(xs[i], ys[i], self.radius + vehicle.r) if j != i]
+            vehicle.sense(view, size)
+            if view.neighbors:
+                self.ignoreNeighborStop(vehicle, size)
+            getattr(vehicle, controller)(duration)
+
+        for vehicle in self.vehicles:
+            vehicle.move()
+
+        # Incremental rehash: only vehicles that crossed a cell boundary
+        for i, vehicle in enumerate(self.vehicles):
+            self.rehashed += self.hash.update(i, vehicle.x, vehicle.y)
+
+        if self.obstacles:
+            self.collide(xs, ys)
+
+    def ignoreNeighborStop(self, vehicle, size):
+        # Raises sensor readings that only neighbors pushed below STOP back
+        # to STOP, so the stop rule fires for the arena's light alone
+        for name, x, y in (("ls", vehicle.lsX, vehicle.lsY), ("rs", vehicle.rsX, vehicle.rsY)):
+            light = size if self.light is None else np.clip(vehicle.sg*float(self.light.distance(x, y)), 0, size)
+            setattr(vehicle, name, max(getattr(vehicle, name), min(light, STOP)))
+
+    def collide(self, xs, ys):
+        # Sends every vehicle of a pair that now overlaps and got closer
+        # during the step back to where it was at its start (xs, ys),
+        # keeping its new heading. Pairs that already overlapped and are
+        # moving apart are left alone, so they can separate.
+        blocked = []
+        for i, vehicle in enumerate(self.vehicles):
+            for j in self.hash.near(vehicle.x, vehicle.y, 2*vehicle.r):
+                other = self.vehicles[j]
+                if j == i:
+                    continue
+                distance = math.hypot(vehicle.x - other.x, vehicle.y - other.y)
+                if distance < vehicle.r + other.r and distance < math.hypot(xs[i] - xs[j], ys[i] - ys[j]):
+                    blocked.append(i)
+                    break
+
+        for i in blocked:
+            self.vehicles[i].place(xs[i], ys[i])
+            self.rehashed += self.hash.update(i, xs[i], ys[i])
+
+        return blocked
+
+    def run(self, duration, controller="think"):
+        # Runs every vehicle for duration steps, returning x and y histories
+        # shaped vehicles × (duration + 1)
+        xHistory = np.zeros((len(self.vehicles), duration + 1))
+        yHistory = np.zeros((len(self.vehicles), duration + 1))
+        xHistory[:, 0] = [vehicle.x for vehicle in self.vehicles]
+        yHistory[:, 0] = [vehicle.y for vehicle in self.vehicles]
+
+        for t in range(duration):
+            self.step(duration, controller)
+            xHistory[:, t+1] = [vehicle.x for vehicle in self.vehicles]
+            yHistory[:, t+1] = [vehicle.y for vehicle in self.vehicles]
+
+        return xHistory, yHistory
+
+
+def scatterVehicles(count, size, rng=None, spacing=2.0, attempts=100):
+    # count vehicles at random points of the square [-size, size]²,
+    # each with a random cardinal heading. Points closer than spacing
+    # (two body radii) to an earlier one are redrawn, so no two vehicles
+    # start overlapping.
+    rng = agent.randomSource(rng)
+    xs = rng.random(count)*2*size - size
+    ys = rng.random(count)*2*size - size
+    placed = SpatialHash(spacing)
+    pending = np.arange(count)
+
+    for attempt in range(attempts):
+        rejected = []
+        for i in pending:
+            if any(math.hypot(xs[i] - xs[j], ys[i] - ys[j]) < spacing for j in placed.near(xs[i], ys[i], spacing)):
+                rejected.append(i)
+            else:
+                placed.update(i, xs[i], ys[i])
+
+        pending = np.array(rejected, dtype=int)
+        if len(pending) == 0:
+            break
+        xs[pending] = rng.random(len(pending))*2*size - size
+        ys[pending] = rng.random(len(pending))*2*size - size
+    else:
+        raise ValueError(f"Could not place {count} vehicles {spacing} apart in [-{size}, {size}]²")
+
+    vehicles = []
+    for x, y in zip(xs, ys):
+        vehicle = agent.Braitenberg()
+        vehicle.o = rng.choice([0, 0.5, 1, 1.5])*np.pi
+        vehicle.place(float(x), float(y))
+        vehicles.append(vehicle)
+    return vehicles
@@ -0,0 +1,149 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import tempfile
+import time
+import tracemalloc
+import agent
+import sim
+import store
+import numpy as np
+
+# Walker classes by the index sim.makeWalker uses
+WALKERS = {"RandomWalker": 0, "TrulyRandomWalker": 1, "RandomRandomWalker": 2}
+
+# Braitenberg controllers
+CONTROLLERS = ["think", "thinkWorldTravel"]
+
+def measure(run, repeat=1):
+    # Returns the best wall time in seconds over repeat untraced runs and
+    # the peak traced memory in bytes of one more run (NumPy reports its
+    # allocations to tracemalloc). Tracing slows pure Python code down a
+    # lot, so it is kept out of the timed runs.
+    walls = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        run()
+        walls.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    run()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return min(walls), peak
+
+def benchWalkers(population, duration):
+    # simBot one bot at a time, simPopulation and simPopulationBatched
+    cases = []
+    for name, kind in WALKERS.items():
+        cases.append(("simBot", name, lambda kind=kind: [sim.simBot(sim.makeWalker(kind, duration), duration) for i in range(population)]))
+        cases.append(("simPopulation", name, lambda kind=kind: sim.simPopulation(sim.makeWalker(kind, duration), population, duration)))
+        cases.append(("simPopulationBatched", name, lambda kind=kind: sim.simPopulationBatched(sim.makeWalker(kind, duration), population, duration)))
+    return cases
+
+def benchVehicles(population, duration):
+    # simVehicle one vehicle at a time and simVehicleBatched, per controller
+    size = int(np.sqrt(duration))
+    cases = []
+    for controller in CONTROLLERS:
+        def single(controller=controller):
+            for i in range(population):
+                sim.simVehicle(agent.Braitenberg(), duration, agent.LightSource(size), controller)
+
+        def batched(controller=controller):
+            lightX, lightY = agent.placeLights(population, size)
+            sim.simVehicleBatched(agent.BraitenbergBatch(population), duration, lightX, lightY, controller)
+
+        cases.append(("simVehicle", f"Braitenberg.{controller}", single))
+        cases.append(("simVehicleBatched", f"Braitenberg.{controller}", batched))
+    return cases
+
+def benchStore(population, duration, folder):
+    # Save and load round-trips through the columnar result store
+    path = os.path.join(folder, f"store{population}x{duration}")
+    xHistories = np.random.random((1, population, duration + 1))
+
+    def save():
+        columns = sim.createRandomStore(path, population, duration, 1)
+        columns["x"][:] = xHistories
+        columns["y"][:] = xHistories
+        columns["displacements"][:] = xHistories
+        store.flushStore(columns)
+
+    def loadAll():
+        results = store.Store(path, mmap=False)
+        results["x"].sum()
+
+    def loadOne():
+        results = store.Store(path)
+        np.asarray(results.trajectory(0, population // 2)[0]).sum()
+
+    return [("storeSave", "random", save), ("storeLoadAll", "random", loadAll), ("storeLoadOne", "random", loadOne)]
+
+def runBenchmarks(populations, durations, groups, repeat=1):
+    # Runs every case of the selected groups for every population and
+    # duration, keeping the fastest of repeat timed runs
+    results = []
+    folder = tempfile.mkdtemp()
+
+    try:
+        for population in populations:
+            for duration in durations:
+                cases = []
+                if "walkers" in groups:
+                    cases += benchWalkers(population, duration)
+                if "vehicles" in groups:
+                    cases += benchVehicles(population, duration)
+                if "store" in groups:
+                    cases += benchStore(population, duration, folder)
+
+                for case, agentName, run in cases:
+                    wall, peak = measure(run, repeat)
+                    steps = population*duration
+                    results.append({
+                        "case": case,
+                        "agent": agentName,
+                        "population": population,
+                        "duration": duration,
+                        "steps": steps,
+                        "wallSeconds": wall,
+                        "stepsPerSecond": steps/wall if wall > 0 else None,
+                        "peakMemoryBytes": peak,
+                    })
+                    print(f"{case:22s} {agentName:28s} P={population:<7d} T={duration:<8d} {wall:9.4f}s {steps/max(wall, 1e-12):14.0f} steps/s {peak/2**20:10.1f} MiB")
+    finally:
+        shutil.rmtree(folder)
+
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulation throughput and memory benchmarks")
+    parser.add_argument("--populations", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--durations", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--groups", nargs="+", default=["walkers", "vehicles", "store"], choices=["walkers", "vehicles", "store"])
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="benchmark.json")
+    args = parser.parse_args()
+
+    np.random.seed(args.seed)
+    results = runBenchmarks(args.populations, args.durations, args.groups, args.repeat)
+
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "cpus": os.cpu_count(),
+        "arguments": vars(args),
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
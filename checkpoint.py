@@ -0,0 +1,70 @@
+import json
+import os
+import numpy as np
+
+# A checkpoint is a single .npz file next to a run's result store: the
+# arrays of the run's state plus a JSON header (progress, RNG state, run
+# settings) kept as a string entry. It is written to a temporary file and
+# renamed into place, so an interruption never leaves half a checkpoint.
+
+def checkpointPath(path):
+    return os.path.join(path, "checkpoint.npz")
+
+def plain(value):
+    # value with NumPy arrays and scalars turned into JSON-ready types
+    if isinstance(value, dict):
+        return {key: plain(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [plain(item) for item in value]
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+def rngState(rng):
+    # JSON-ready state of np.random (or a legacy RandomState) or of an
+    # np.random.Generator
+    if isinstance(rng, np.random.Generator):
+        return {"kind": "generator", "state": plain(rng.bit_generator.state)}
+    return {"kind": "legacy", "state": plain(rng.get_state())}
+
+def setRngState(rng, state):
+    # Puts rng back into a state saved by rngState
+    value = state["state"]
+    if state["kind"] == "generator":
+        if value["bit_generator"] == "MT19937":
+            value["state"]["key"] = np.array(value["state"]["key"], dtype=np.uint32)
+        rng.bit_generator.state = value
+    else:
+        name, keys, pos, hasGauss, cached = value
+        rng.set_state((name, np.array(keys, dtype=np.uint32), pos, hasGauss, cached))
+
+def save(path, header, arrays):
+    # Atomically replaces the checkpoint at path
+    temporary = path + ".tmp"
+    with open(temporary, "wb") as f:
+        np.savez(f, header=np.array(json.dumps(plain(header))), **arrays)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporary, path)
+
+def load(path):
+    # (header, arrays) of the checkpoint at path, or (None, None) if there
+    # is none
+    if not os.path.exists(path):
+        return None, None
+    with np.load(path) as data:
+        header = json.loads(str(data["header"]))
+        arrays = {name: data[name] for name in data.files if name != "header"}
+    return header, arrays
+
+def checkRun(header, run):
+    # Refuses to resume a checkpoint made with different run settings
+    if header["run"] != plain(run):
+        raise ValueError(f"Checkpoint is for run {header['run']}, not {plain(run)}")
+
+def remove(path):
+    # Drops the checkpoint of a finished run
+    if os.path.exists(path):
+        os.remove(path)
@@ -0,0 +1,164 @@
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import time
+import sim
+import store
+import numpy as np
+
+# Cache of result stores addressed by the experiment configuration: every
+# entry is a store directory named after the hash of the configuration and
+# of the simulation code, so a repeated request is read straight from disk
+# and an edit to the simulation never serves stale results.
+#
+#   cache/<key>/meta.json, x.npy, ...   the run's result store
+#   cache/<key>/config.json             configuration and code version
+#
+# config.json's modification time records the entry's last use; the least
+# recently used entries are evicted to keep the cache bounded.
+
+CACHE = "cache"
+
+MAX_ENTRIES = 32
+MAX_BYTES = 4*1024**3
+
+# Settings of every kind of experiment, with their defaults
+DEFAULTS = {
+    "random": {"population": 5, "duration": 10000, "numTypes": 3, "windows": 1, "compact": False, "seed": 0},
+    "vehicle": {"duration": 10000, "numLights": 10, "controller": "think", "windows": 1, "seed": 0},
+}
+
+# Modules whose source decides the results: this one (seeding and how
+# settings map onto the runs), sim and everything sim imports
+CODE = ["agent.py", "checkpoint.py", "experiment.py", "gridpaths.py", "instrument.py", "metrics.py", "pipeline.py", "sim.py", "stats.py", "store.py"]
+
+def normalize(config):
+    # Full configuration: defaults filled in, unknown settings refused
+    config = dict(config)
+    kind = config.pop("kind", "vehicle")
+    if kind not in DEFAULTS:
+        raise ValueError(f"Unknown experiment kind {kind!r}, expected one of {sorted(DEFAULTS)}")
+
+    unknown = set(config) - set(DEFAULTS[kind])
+    if unknown:
+        raise ValueError(f"Unknown settings for a {kind} experiment: {sorted(unknown)}")
+
+    result = {"kind": kind}
+    result.update(DEFAULTS[kind])
+    result.update(config)
+    return result
+
+def codeVersion():
+    # Hash of the simulation sources
+    digest = hashlib.sha256()
+    folder = os.path.dirname(os.path.abspath(__file__))
+    for name in CODE:
+        with open(os.path.join(folder, name), "rb") as f:
+            digest.update(name.encode() + b"\0" + f.read())
+    return digest.hexdigest()
+
+def experimentKey(config, version=None):
+    # Cache key of a normalized configuration
+    text = json.dumps({"config": config, "code": version or codeVersion()}, sort_keys=True)
+    return hashlib.sha256(text.encode()).hexdigest()[:32]
+
+def simulate(config, path):
+    # Runs the experiment into a new store at path
+    np.random.seed(config["seed"])
+    if config["kind"] == "random":
+        sim.runRandom(config["population"], config["duration"], config["numTypes"], path, windows=config["windows"], compact=config["compact"])
+    else:
+        sim.runVehicle(config["duration"], config["numLights"], config["controller"], path=path, windows=config["windows"])
+
+def entrySize(path):
+    return sum(entry.stat().st_size for entry in os.scandir(path) if entry.is_file())
+
+def entries(cache):
+    # (key, last use, size in bytes) of every finished cache entry
+    result = []
+    for entry in os.scandir(cache):
+        configPath = os.path.join(entry.path, "config.json")
+        if entry.is_dir() and not entry.name.startswith(".") and os.path.exists(configPath):
+            result.append((entry.name, os.stat(configPath).st_mtime, entrySize(entry.path)))
+    return result
+
+def evict(cache=CACHE, maxEntries=MAX_ENTRIES, maxBytes=MAX_BYTES, keep=None):
+    # Removes the least recently used entries (never keep) until at most
+    # maxEntries entries and maxBytes bytes are left. Returns the evicted keys.
+    found = sorted(entries(cache), key=lambda entry: entry[1])
+    count = len(found)
+    size = sum(entry[2] for entry in found)
+
+    evicted = []
+    for key, used, entryBytes in found:
+        if count <= maxEntries and size <= maxBytes:
+            break
+        if key == keep:
+            continue
+        shutil.rmtree(os.path.join(cache, key), ignore_errors=True)
+        evicted.append(key)
+        count -= 1
+        size -= entryBytes
+    return evicted
+
+def runExperiment(config, cache=CACHE, maxEntries=MAX_ENTRIES, maxBytes=MAX_BYTES):
+    # Result store of the experiment described by config (see DEFAULTS),
+    # simulated only if the cache does not hold it yet. Returns the
+    # store.Store and whether it came from the cache.
+    config = normalize(config)
+    version = codeVersion()
+    key = experimentKey(config, version)
+    path = os.path.join(cache, key)
+    configPath = os.path.join(path, "config.json")
+
+    if os.path.exists(configPath):
+        os.utime(configPath)
+        return store.Store(path), True
+
+    # Simulate into a private folder and move it into place once complete,
+    # so an interrupted run never leaves an entry behind
+    os.makedirs(cache, exist_ok=True)
+    partial = os.path.join(cache, f".{key}.{os.getpid()}.partial")
+    shutil.rmtree(partial, ignore_errors=True)
+    simulate(config, partial)
+    with open(os.path.join(partial, "config.json"), "w") as f:
+        json.dump({"config": config, "code": version, "created": time.strftime("%Y-%m-%dT%H:%M:%S")}, f, indent=2)
+
+    try:
+        os.replace(partial, path)
+    except OSError:
+        # Another process finished the same experiment first
+        shutil.rmtree(partial, ignore_errors=True)
+        os.utime(configPath)
+
+    evict(cache, maxEntries, maxBytes, keep=key)
+    return store.Store(path), False
+
+def main():
+    parser = argparse.ArgumentParser(description="Run an experiment, or read it from the result cache")
+    parser.add_argument("kind", choices=sorted(DEFAULTS))
+    parser.add_argument("--population", type=int)
+    parser.add_argument("--duration", type=int)
+    parser.add_argument("--num-types", dest="numTypes", type=int)
+    parser.add_argument("--num-lights", dest="numLights", type=int)
+    parser.add_argument("--controller", choices=["think", "thinkWorldTravel"])
+    parser.add_argument("--windows", type=int)
+    parser.add_argument("--compact", action="store_true", default=None)
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--cache", default=CACHE)
+    parser.add_argument("--max-entries", type=int, default=MAX_ENTRIES)
+    parser.add_argument("--max-bytes", type=int, default=MAX_BYTES)
+    args = vars(parser.parse_args())
+
+    cache = args.pop("cache")
+    maxEntries = args.pop("max_entries")
+    maxBytes = args.pop("max_bytes")
+    config = {name: value for name, value in args.items() if value is not None}
+
+    results, cached = runExperiment(config, cache, maxEntries, maxBytes)
+    print(f"{'Cached' if cached else 'Simulated'}: {results.path}")
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
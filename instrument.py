@@ -0,0 +1,68 @@
+import contextlib
+import json
+import time
+from collections import defaultdict
+
+class Profiler():
+    def __init__(self):
+        # Seconds spent and number of calls per phase (sense, think, move,
+        # turn, step, history, exploration, ...) plus free-form counters
+        # such as the number of steps a vehicle spent halted.
+        self.seconds = defaultdict(float)
+        self.calls = defaultdict(int)
+        self.counters = defaultdict(int)
+        self.clock = time.perf_counter
+
+    def add(self, phase, seconds, calls=1):
+        self.seconds[phase] += seconds
+        self.calls[phase] += calls
+
+    def count(self, name, amount=1):
+        self.counters[name] += amount
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        # Times the enclosed block as one call of the given phase
+        start = self.clock()
+        try:
+            yield
+        finally:
+            self.add(name, self.clock() - start)
+
+    def merge(self, other):
+        # Folds in another profiler's numbers, e.g. from another run
+        for phase, seconds in other.seconds.items():
+            self.add(phase, seconds, other.calls[phase])
+        for name, amount in other.counters.items():
+            self.count(name, amount)
+
+    def report(self):
+        # Per-run report as a plain dictionary
+        total = sum(self.seconds.values())
+        phases = {}
+        for phase, seconds in sorted(self.seconds.items(), key=lambda item: -item[1]):
+            phases[phase] = {
+                "seconds": seconds,
+                "calls": self.calls[phase],
+                "share": seconds/total if total > 0 else 0.0,
+            }
+        return {"totalSeconds": total, "phases": phases, "counters": dict(self.counters)}
+
+    def save(self, path):
+        with open(path, "w") as f:
+            json.dump(self.report(), f, indent=2)
+
+    def __str__(self):
+        report = self.report()
+        lines = [f"{'phase':14s} {'seconds':>10s} {'calls':>10s} {'share':>7s}"]
+        for phase, entry in report["phases"].items():
+            lines.append(f"{phase:14s} {entry['seconds']:10.4f} {entry['calls']:10d} {entry['share']:7.1%}")
+        for name, amount in report["counters"].items():
+            lines.append(f"{name:14s} {amount:10d}")
+        return "\n".join(lines)
+
+def phase(profiler, name):
+    # profiler.phase(name), or a no-op block when profiling is disabled
+    if profiler is None:
+        return contextlib.nullcontext()
+    return profiler.phase(name)
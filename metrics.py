@@ -0,0 +1,97 @@
+import numpy as np
+
+# Trajectory metrics over stacked histories: x and y hold one path per row
+# along the last axis (e.g. numTypes × population × (duration + 1)), and
+# every metric is computed for all paths at once.
+
+def boundingBoxes(x, y):
+    # (xMin, xMax, yMin, yMax) of every path
+    return x.min(axis=-1), x.max(axis=-1), y.min(axis=-1), y.max(axis=-1)
+
+def coverageRatios(x, y, explorations):
+    # Explored cells relative to the grid edges inside each path's
+    # bounding box, as visualize.findExploredRandom computes it
+    xMin, xMax, yMin, yMax = boundingBoxes(x, y)
+    xRange = xMax - xMin
+    yRange = yMax - yMin
+    size = (xRange * (yRange + 1)) + (yRange * (xRange + 1))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return explorations / size
+
+def radiusOfGyration(x, y):
+    # Root mean square distance of every path's points from its centroid
+    dx = x - x.mean(axis=-1, keepdims=True)
+    dy = y - y.mean(axis=-1, keepdims=True)
+    return np.sqrt((dx**2 + dy**2).mean(axis=-1))
+
+def pathLengths(x, y):
+    # Total distance travelled along every path
+    return np.sqrt(np.diff(x, axis=-1)**2 + np.diff(y, axis=-1)**2).sum(axis=-1)
+
+def tortuosity(x, y):
+    # Path length over the straight-line distance from start to end
+    # (1 for a straight path, inf for one that came back to its start)
+    net = np.sqrt((x[..., -1] - x[..., 0])**2 + (y[..., -1] - y[..., 0])**2)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return pathLengths(x, y) / net
+
+def stopRadius(sg=1/10.0, r=1.0):
+    # Distance from its light within which a vehicle's centre is once the
+    # stop rule halts it: think() stops the motors when a sensor reads
+    # below 0.5, i.e. lies within 0.5/sg of the light, and the sensors sit
+    # r from the centre. Defaults are agent.Braitenberg's gains.
+    return 0.5/np.asarray(sg) + r
+
+def timeToTarget(x, y, targetX, targetY, radius=None):
+    # First history index at which every path comes within radius (one, or
+    # one per path) of its target, or -1 if it never does. radius defaults
+    # to stopRadius(), so a vehicle counts as arrived at its light by the
+    # time it halts.
+    radius = np.expand_dims(stopRadius() if radius is None else radius, -1)
+    reached = (x - np.expand_dims(targetX, -1))**2 + (y - np.expand_dims(targetY, -1))**2 <= radius**2
+    return np.where(reached.any(axis=-1), reached.argmax(axis=-1), -1)
+
+def fitnessScores(x, y, lightX, lightY):
+    # How much closer every path ended up to its light than it started,
+    # clipped to [0, 1], as visualize.getFitnessScore scores a vehicle
+    startDist = np.sqrt((x[..., 0] - lightX)**2 + (y[..., 0] - lightY)**2)
+    endDist = np.sqrt((x[..., -1] - lightX)**2 + (y[..., -1] - lightY)**2)
+    return np.clip(1 - (endDist / startDist), 0, 1)
+
+def autocorrelation(values):
+    # Sum over k of values[k]*values[k+m] for every lag m, through a
+    # zero-padded FFT
+    n = values.shape[-1]
+    spectrum = np.fft.rfft(values, n=2*n, axis=-1)
+    return np.fft.irfft(spectrum*np.conj(spectrum), n=2*n, axis=-1)[..., :n]
+
+def meanSquaredDisplacement(x, y):
+    # Time-averaged mean squared displacement of every path at every lag
+    # m = 0..n-1, in O(n log n):
+    #   MSD(m) = S1(m) - 2*S2(m)
+    # where S2 is the positions' autocorrelation over the n - m pairs and
+    # S1 the mean of |r(k)|² + |r(k+m)|² over the same pairs, from
+    # cumulative sums of the squared norms
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = x.shape[-1]
+    pairs = n - np.arange(n)
+
+    squared = x**2 + y**2
+    cumulative = np.concatenate([np.zeros(squared.shape[:-1] + (1,)), np.cumsum(squared, axis=-1)], axis=-1)
+    total = cumulative[..., -1:]
+    # Sum of squared[k] for k < n - m plus for k >= m
+    s1 = (cumulative[..., n - np.arange(n)] + total - cumulative[..., np.arange(n)]) / pairs
+    s2 = (autocorrelation(x) + autocorrelation(y)) / pairs
+    return s1 - 2*s2
+
+def diffusionCoefficient(msd, start=1, stop=None):
+    # Diffusion coefficient D of 2D paths from the slope of MSD = 4*D*lag,
+    # fitted by least squares over lags start..stop (the tail is noisy,
+    # so by default only the first quarter of the lags is used)
+    stop = stop or max(start + 2, msd.shape[-1] // 4)
+    lags = np.arange(start, stop)
+    values = msd[..., start:stop]
+    centered = lags - lags.mean()
+    slope = (values*centered).sum(axis=-1) / (centered**2).sum()
+    return slope/4
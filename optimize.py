@@ -0,0 +1,115 @@
+import os
+import agent
+import metrics
+import parallel
+import sim
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+
+# Tuned gains: sensor gain sg, and the scales vk and tk applied to the
+# velocity and turning gains that think() derives from duration
+GAINS = ["sg", "vk", "tk"]
+
+# History steps simulated at a time while evaluating, which bounds the
+# memory of a candidates × lights batch at any duration
+EVALUATE_CHUNK = 1024
+
+# Search range of every gain, as powers of ten
+BOUNDS = np.array([
+    [-3.0, 0.0], # sg
+    [-2.0, 2.0], # vk
+    [-2.0, 2.0], # tk
+])
+
+def evaluateGains(gains, duration, lightX, lightY, orientations, controller="think"):
+    # Mean fitness of every candidate gain set (rows of gains, in GAINS
+    # order) over the same light placements and starting orientations.
+    # All candidate × light pairs run together as one vehicle batch through
+    # sim.simVehicleBatched, so halted vehicles are fast-forwarded; only
+    # their final positions are kept.
+    numCandidates = len(gains)
+    numLights = len(lightX)
+
+    vehicles = agent.BraitenbergBatch(numCandidates*numLights, o=np.tile(orientations, numCandidates))
+    for column, name in enumerate(GAINS):
+        setattr(vehicles, name, np.repeat(gains[:, column], numLights))
+
+    lightX = np.tile(lightX, numCandidates)
+    lightY = np.tile(lightY, numCandidates)
+
+    for chunk in sim.streamVehicleBatched(vehicles, duration, lightX, lightY, EVALUATE_CHUNK, controller):
+        pass
+
+    # Start (the origin) and end point of every path
+    start = np.zeros(len(vehicles))
+    scores = metrics.fitnessScores(np.stack([start, vehicles.x], axis=-1), np.stack([start, vehicles.y], axis=-1), lightX, lightY)
+    return scores.reshape(numCandidates, numLights).mean(axis=1)
+
+def evaluateParallel(gains, duration, lightX, lightY, orientations, controller, workers, pool=None):
+    # evaluateGains over chunks of candidates on pool, a process pool of
+    # workers processes (run in this process without one)
+    if pool is None:
+        return evaluateGains(gains, duration, lightX, lightY, orientations, controller)
+
+    chunks = parallel.splitTasks(len(gains), workers)
+    futures = [pool.submit(evaluateGains, gains[first:last], duration, lightX, lightY, orientations, controller) for first, last in chunks]
+    return np.concatenate([future.result() for future in futures])
+
+def optimizeGains(duration, numLights, generations=20, candidates=32, method="evolution", controller="think", seed=0, workers=None, elite=0.25):
+    # Searches for the gains that maximize the mean fitness score over
+    # numLights light placements, which are drawn once and shared by every
+    # candidate so scores are directly comparable. method is "random"
+    # (uniform random search in log space) or "evolution" (a cross-entropy
+    # evolution strategy that refits a log-normal search distribution to
+    # the best elite fraction of every generation). Returns the best gains
+    # as a dict, their score, and a per-generation convergence log.
+    workers = workers or os.cpu_count()
+    rng = np.random.default_rng(seed)
+
+    # Shared light placements and starting orientations
+    lightX, lightY = agent.placeLights(numLights, int(np.sqrt(duration)), rng)
+    orientations = rng.choice([0, 0.5, 1, 1.5], size=numLights)*np.pi
+
+    # Search distribution over log10 gains, starting from the defaults
+    mean = np.log10([1/10.0, 1.0, 1.0])
+    spread = (BOUNDS[:, 1] - BOUNDS[:, 0])/4
+
+    best = None
+    bestScore = -np.inf
+    log = []
+
+    # One process pool for the whole search, none for a single worker
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        for generation in range(generations):
+            if method == "random":
+                logGains = rng.uniform(BOUNDS[:, 0], BOUNDS[:, 1], size=(candidates, len(GAINS)))
+            else:
+                logGains = np.clip(rng.normal(mean, spread, size=(candidates, len(GAINS))), BOUNDS[:, 0], BOUNDS[:, 1])
+            gains = 10**logGains
+
+            scores = evaluateParallel(gains, duration, lightX, lightY, orientations, controller, workers, pool)
+
+            top = np.argmax(scores)
+            if scores[top] > bestScore:
+                best = gains[top]
+                bestScore = scores[top]
+
+            if method != "random":
+                # Refit the search distribution to the elite candidates
+                order = np.argsort(scores)[::-1][:max(2, int(elite*candidates))]
+                mean = logGains[order].mean(axis=0)
+                spread = np.maximum(logGains[order].std(axis=0), 1e-3)
+
+            log.append({
+                "generation": generation,
+                "best": float(scores[top]),
+                "mean": float(scores.mean()),
+                "bestSoFar": float(bestScore),
+                "gains": dict(zip(GAINS, gains[top].tolist())),
+            })
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    return dict(zip(GAINS, best.tolist())), float(bestScore), log
@@ -0,0 +1,221 @@
+import copy
+import os
+import agent
+import sim
+import stats
+import store
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+# Stream families, so walker and vehicle tasks never share a random stream
+WALKER_STREAM = 0
+VEHICLE_STREAM = 1
+
+# Result arrays backed by shared memory, attached in every worker process
+shared = {}
+blocks = []
+
+def taskRng(seed, *key):
+    # Independent random stream for one task, identified by its key
+    # (e.g. walker type and bot index) so results never depend on which
+    # worker runs it or how the tasks were chunked.
+    return np.random.default_rng(np.random.SeedSequence(seed, spawn_key=key))
+
+def splitTasks(count, workers):
+    # Splits range(count) into (first, last) chunks, a few per worker
+    chunks = max(1, min(count, 4*workers))
+    edges = np.linspace(0, count, chunks + 1).astype(int)
+    return [(edges[i], edges[i+1]) for i in range(chunks) if edges[i] < edges[i+1]]
+
+def attachShared(specs):
+    # Maps every shared block into this process as a NumPy array
+    for name, (blockName, shape, dtype) in specs.items():
+        block = shared_memory.SharedMemory(name=blockName)
+        blocks.append(block)
+        shared[name] = np.ndarray(shape, dtype=dtype, buffer=block.buf)
+
+def runShared(task, tasks, shapes, workers):
+    # Runs task(*args) for every entry of tasks on a process pool. Workers
+    # write their results straight into shared arrays with the given
+    # shapes, which are copied out and released once every task is done.
+    owned = {}
+    specs = {}
+    for name, (shape, dtype) in shapes.items():
+        size = max(int(np.prod(shape))*np.dtype(dtype).itemsize, 1)
+        owned[name] = shared_memory.SharedMemory(create=True, size=size)
+        specs[name] = (owned[name].name, shape, dtype)
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=attachShared, initargs=(specs,)) as pool:
+            for future in [pool.submit(task, *args) for args in tasks]:
+                future.result()
+
+        results = {}
+        for name, (shape, dtype) in shapes.items():
+            results[name] = np.array(np.ndarray(shape, dtype=dtype, buffer=owned[name].buf))
+    finally:
+        for block in owned.values():
+            block.close()
+            block.unlink()
+
+    return results
+
+def occupancyShapes(shapes, layout, tasks):
+    # Adds one occupancy slot per task to shapes; every task fills its own
+    # slot, so workers never write to the same counts
+    if layout is not None:
+        grid = stats.OccupancyGrid(*layout)
+        shapes["occupancy"] = ((tasks,) + grid.counts.shape, "int64")
+        shapes["occupancyOutside"] = ((tasks,) + grid.outside.shape, "int64")
+
+def saveSlot(slot, grid):
+    shared["occupancy"][slot] = grid.counts
+    shared["occupancyOutside"][slot] = grid.outside
+
+def mergeSlot(results, slot, grid):
+    # Folds the occupancy counts of one task into grid
+    other = stats.OccupancyGrid(*grid.layout())
+    other.counts = results["occupancy"][slot]
+    other.outside = results["occupancyOutside"][slot]
+    grid.merge(other)
+
+def walkerTask(kind, first, last, duration, seed, sparse, slot=None, layout=None):
+    # Simulates bots first..last-1 of walker type kind. As in sim.runRandom,
+    # every bot of a type starts from the same focus walker, drawn from the
+    # type's own random stream (so every task draws the same one), and
+    # each bot turns with its own stream. With layout, their paths are also
+    # counted into the occupancy slot of this task.
+    grid = stats.OccupancyGrid(*layout) if layout is not None else None
+    focus = sim.makeWalker(kind, duration, taskRng(seed, WALKER_STREAM, kind))
+
+    for r in range(first, last):
+        bot = copy.copy(focus)
+        bot.rng = taskRng(seed, WALKER_STREAM, kind, r)
+        history, displacement, exploration = sim.simBot(bot, duration, sparse)
+
+        shared["x"][kind, r] = history.xHistory
+        shared["y"][kind, r] = history.yHistory
+        shared["displacements"][kind, r] = displacement
+        shared["explorations"][kind, r] = exploration
+        if grid is not None:
+            grid.addHistory(history.xHistory, history.yHistory)
+
+    if grid is not None:
+        saveSlot(slot, grid)
+
+def vehicleTask(first, last, duration, seed, controller, slot=None, layout=None):
+    # Simulates light trials first..last-1 as one batch, drawing every
+    # trial's light and vehicle from that trial's own random stream. With
+    # layout, their paths are also counted into the occupancy slot of
+    # this task.
+    size = int(np.sqrt(duration))
+    lightX = np.zeros(last - first, dtype=int)
+    lightY = np.zeros(last - first, dtype=int)
+    vehicles = []
+
+    for i in range(first, last):
+        rng = taskRng(seed, VEHICLE_STREAM, i)
+        x, y = agent.placeLights(1, size, rng)
+        lightX[i - first] = x[0]
+        lightY[i - first] = y[0]
+        vehicles.append(agent.BraitenbergBatch(1, rng))
+
+    xHistory, yHistory, convergedAt = sim.simVehicleBatched(agent.BraitenbergBatch.concatenate(vehicles), duration, lightX, lightY, controller, report=True)
+
+    shared["convergedAt"][first:last] = convergedAt
+    shared["x"][first:last] = xHistory
+    shared["y"][first:last] = yHistory
+    shared["lights"][first:last, 0] = lightX
+    shared["lights"][first:last, 1] = lightY
+
+    if layout is not None:
+        grid = stats.OccupancyGrid(*layout)
+        grid.addHistory(xHistory, yHistory)
+        saveSlot(slot, grid)
+
+def simRandomParallel(population, duration, numTypes, seed=0, workers=None, sparse=False, occupancy=None):
+    # Simulates population bots of each walker type across a process pool.
+    # Returns x and y histories and displacements shaped
+    # numTypes × population × (duration + 1) and explorations shaped
+    # numTypes × population, identical for any number of workers. With
+    # occupancy (one stats.OccupancyGrid per walker type), the workers'
+    # occupancy counts are merged into it.
+    workers = workers or os.cpu_count()
+    steps = (numTypes, population, duration + 1)
+    shapes = {
+        "x": (steps, "float64"),
+        "y": (steps, "float64"),
+        "displacements": (steps, "float64"),
+        "explorations": ((numTypes, population), "int64"),
+    }
+
+    layouts = [grid.layout() for grid in occupancy] if occupancy is not None else [None]*numTypes
+    tasks = []
+    for kind in range(numTypes):
+        for first, last in splitTasks(population, workers):
+            tasks.append((kind, first, last, duration, seed, sparse, len(tasks), layouts[kind]))
+    occupancyShapes(shapes, layouts[0], len(tasks))
+
+    results = runShared(walkerTask, tasks, shapes, workers)
+    if occupancy is not None:
+        for task in tasks:
+            mergeSlot(results, task[6], occupancy[task[0]])
+    return results["x"], results["y"], results["displacements"], results["explorations"]
+
+def simVehicleParallel(duration, numLights, seed=0, workers=None, controller="think", occupancy=None, report=False):
+    # Simulates numLights light trials across a process pool. Returns x and
+    # y histories shaped numLights × (duration + 1) and light positions
+    # shaped numLights × 2, identical for any number of workers. With
+    # occupancy (a stats.OccupancyGrid), the workers' occupancy counts are
+    # merged into it. With report, also returns the history index each
+    # vehicle halted at, as sim.simVehicleBatched does.
+    workers = workers or os.cpu_count()
+    shapes = {
+        "x": ((numLights, duration + 1), "float64"),
+        "y": ((numLights, duration + 1), "float64"),
+        "lights": ((numLights, 2), "float64"),
+        "convergedAt": ((numLights,), "int64"),
+    }
+
+    layout = occupancy.layout() if occupancy is not None else None
+    chunks = splitTasks(numLights, workers)
+    tasks = [(first, last, duration, seed, controller, slot, layout) for slot, (first, last) in enumerate(chunks)]
+    occupancyShapes(shapes, layout, len(tasks))
+
+    results = runShared(vehicleTask, tasks, shapes, workers)
+    if occupancy is not None:
+        for slot in range(len(tasks)):
+            mergeSlot(results, slot, occupancy)
+    if report:
+        return results["x"], results["y"], results["lights"], results["convergedAt"]
+    return results["x"], results["y"], results["lights"]
+
+def runRandomParallel(population, duration, numTypes, seed=0, workers=None, path=store.RANDOM_STORE, windows=1, extent=None, bins=256):
+    # Parallel version of sim.runRandom, saving results the same way. Each
+    # type's occupancy grid is centred on the focus walker its tasks draw.
+    foci = [sim.makeWalker(kind, duration, taskRng(seed, WALKER_STREAM, kind)) for kind in range(numTypes)]
+    occupancy = [sim.walkerOccupancy(focus, duration, windows, extent, bins) for focus in foci]
+    xHistories, yHistories, displacements, explorations = simRandomParallel(population, duration, numTypes, seed, workers, occupancy=occupancy)
+
+    columns = sim.createRandomStore(path, population, duration, numTypes, occupancy[0], seed=seed)
+    columns["x"][:] = xHistories
+    columns["y"][:] = yHistories
+    columns["displacements"][:] = displacements
+    columns["explorations"][:] = explorations
+    for kind, grid in enumerate(occupancy):
+        sim.saveOccupancy(columns, kind, grid)
+    store.flushStore(columns)
+
+def runVehicleParallel(duration, numLights, seed=0, workers=None, controller="think", path=store.VEHICLE_STORE, windows=1):
+    # Parallel version of sim.runVehicle, saving results the same way
+    occupancy = stats.OccupancyGrid(2*int(np.sqrt(duration)), windows=windows, duration=duration)
+    xHistory, yHistory, lights, convergedAt = simVehicleParallel(duration, numLights, seed, workers, controller, occupancy, report=True)
+
+    columns = sim.createVehicleStore(path, duration, numLights, occupancy, controller=controller, seed=seed)
+    columns["x"][:] = xHistory
+    columns["y"][:] = yHistory
+    columns["lights"][:] = lights
+    columns["convergedAt"][:] = convergedAt
+    sim.saveOccupancy(columns, (), occupancy)
+    store.flushStore(columns)
@@ -0,0 +1,74 @@
+import queue
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+class Writer():
+    def __init__(self, depth=2):
+        # Background thread running queued write jobs in order, so the
+        # simulation carries on while earlier results reach the disk. At
+        # most depth jobs wait in the queue; put() blocks beyond that,
+        # which bounds the memory held by results not yet written.
+        self.queue = queue.Queue(maxsize=depth)
+        self.error = None
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def run(self):
+        while True:
+            job = self.queue.get()
+            if job is None:
+                return
+            function, args = job
+            if self.error is None:
+                try:
+                    function(*args)
+                except BaseException as error:
+                    # Kept for the producer, later jobs are skipped
+                    self.error = error
+
+    def check(self):
+        if self.error is not None:
+            raise self.error
+
+    def put(self, function, *args):
+        # Queues function(*args), raising any error an earlier job hit
+        self.check()
+        self.queue.put((function, args))
+
+    def close(self):
+        # Waits for every queued job to finish
+        self.queue.put(None)
+        self.thread.join()
+        self.check()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, kind, value, traceback):
+        if kind is None:
+            self.close()
+        else:
+            # Let the writer drain, but report the producer's error
+            self.queue.put(None)
+            self.thread.join()
+
+
+def prefetch(load, keys, depth=2):
+    # Yields (key, load(key)) for every key in order, with a background
+    # thread already loading the next depth keys while the caller works
+    # on the current one
+    keys = iter(keys)
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        pending = deque()
+        for key in keys:
+            pending.append((key, pool.submit(load, key)))
+            if len(pending) > depth:
+                break
+
+        while pending:
+            key, future = pending.popleft()
+            for nextKey in keys:
+                pending.append((nextKey, pool.submit(load, nextKey)))
+                break
+            yield key, future.result()
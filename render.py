@@ -0,0 +1,183 @@
+import argparse
+import os
+import stats
+import store
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.collections import LineCollection
+from matplotlib.figure import Figure
+
+# Points kept per path when decimating
+POINTS = 2000
+
+def lttb(x, y, points=POINTS):
+    # Largest-Triangle-Three-Buckets decimation of the paths along the last
+    # axis of x and y. Returns, for every path, the indices of the points
+    # kept: always the first and last, plus one per bucket in between,
+    # chosen to form the largest triangle with the point kept before it
+    # and the mean of the next bucket. That keeps the turns and extremes
+    # plain striding drops. All paths are decimated together.
+    x = np.asarray(x)
+    y = np.asarray(y)
+    shape = x.shape[:-1]
+    n = x.shape[-1]
+    points = max(points, 3)
+    if points >= n:
+        return np.broadcast_to(np.arange(n), x.shape)
+
+    x = x.reshape(-1, n)
+    y = y.reshape(-1, n)
+    rows = np.arange(len(x))
+
+    # Bucket i covers edges[i]..edges[i+1], between the fixed end points
+    edges = (np.arange(points - 1)*(n - 2)/(points - 2)).astype(int) + 1
+    edges[-1] = n - 1
+
+    kept = np.zeros((len(x), points), dtype=np.int64)
+    kept[:, -1] = n - 1
+
+    for i in range(points - 2):
+        start, end = edges[i], edges[i+1]
+        nextEnd = edges[i+2] if i + 2 < len(edges) else n
+
+        # Previously kept point and mean of the next bucket
+        ax = x[rows, kept[:, i]][:, None]
+        ay = y[rows, kept[:, i]][:, None]
+        cx = x[:, end:nextEnd].mean(axis=1)[:, None]
+        cy = y[:, end:nextEnd].mean(axis=1)[:, None]
+
+        area = np.abs((ax - cx)*(y[:, start:end] - ay) - (ax - x[:, start:end])*(cy - ay))
+        kept[:, i+1] = start + np.argmax(area, axis=1)
+
+    return kept.reshape(shape + (points,))
+
+def decimate(x, y, points=POINTS):
+    # x and y of the paths reduced to the points lttb keeps
+    kept = lttb(x, y, points)
+    return np.take_along_axis(np.asarray(x), kept, axis=-1), np.take_along_axis(np.asarray(y), kept, axis=-1)
+
+def drawPaths(ax, x, y, lights=None, points=POINTS, markers=True):
+    # Draws every path (rows of x and y) on ax as one LineCollection, with
+    # start points in red, end points in black and lights in magenta,
+    # each as a single scatter call
+    x, y = decimate(np.atleast_2d(x), np.atleast_2d(y), points)
+    segments = np.stack([x, y], axis=-1)
+    colors = [f"C{i % 10}" for i in range(len(segments))]
+
+    ax.add_collection(LineCollection(segments, colors=colors, linewidths=0.8))
+    if lights is not None:
+        lights = np.reshape(lights, (-1, 2))
+        ax.scatter(lights[:, 0], lights[:, 1], c="m", s=20, zorder=3)
+    if markers:
+        ax.scatter(x[:, 0], y[:, 0], c="r", s=12, zorder=3)   # Start
+        ax.scatter(x[:, -1], y[:, -1], c="k", s=12, zorder=3) # End
+    ax.autoscale()
+
+def drawOccupancy(ax, grid, window=None):
+    # Draws a stats.OccupancyGrid (one time window or all of them) as a
+    # log-scaled density image
+    image = ax.imshow(np.log10(grid.density(window).T + 1e-12), origin="lower", extent=grid.bounds(), cmap="viridis", vmin=-8)
+    ax.figure.colorbar(image, ax=ax, label="log10 density")
+
+def readOccupancy(results, index=()):
+    # One stats.OccupancyGrid saved in a store (see sim.saveOccupancy).
+    # Stores without occupancyBounds have one square around the origin.
+    layout = dict(results.meta["occupancy"])
+    if "occupancyBounds" in results:
+        x, y, extent = results["occupancyBounds"][index]
+        layout.update(extent=float(extent), center=(float(x), float(y)))
+    grid = stats.OccupancyGrid(**layout)
+    grid.counts = np.array(results["occupancy"][index])
+    grid.outside = np.array(results["occupancyOutside"][index])
+    return grid
+
+def renderFigure(path, x, y, title, lights=None, points=POINTS, dpi=100):
+    # Renders the paths to an image file with the Agg canvas, so no
+    # display or pyplot state is needed
+    figure = Figure(figsize=(6, 6))
+    FigureCanvasAgg(figure)
+    ax = figure.add_subplot()
+    drawPaths(ax, x, y, lights, points)
+    ax.set_xlabel("x")
+    ax.set_ylabel("y")
+    ax.set_title(title)
+    figure.savefig(path, dpi=dpi)
+    return path
+
+def renderOccupancy(path, grid, title, window=None, dpi=100):
+    figure = Figure(figsize=(7, 6))
+    FigureCanvasAgg(figure)
+    ax = figure.add_subplot()
+    drawOccupancy(ax, grid, window)
+    ax.set_xlabel("x")
+    ax.set_ylabel("y")
+    ax.set_title(title)
+    figure.savefig(path, dpi=dpi)
+    return path
+
+def renderJob(job):
+    # Renders one figure of a store; runs in a worker process, which maps
+    # the store itself so only the paths it draws are read. Indices
+    # starting with "occupancy" select a saved occupancy grid instead.
+    storePath, index, path, title, points, dpi = job
+    results = store.Store(storePath)
+    if index[:1] == ("occupancy",):
+        return renderOccupancy(path, readOccupancy(results, index[1:]), title, dpi=dpi)
+    x, y = results.trajectory(*index)
+    lights = results["lights"][index] if "lights" in results else None
+    return renderFigure(path, x, y, title, lights, points, dpi)
+
+def storeJobs(storePath, folder, perPath=False, points=POINTS, dpi=100, format="png"):
+    # One figure per walker type (every bot together) or one for all
+    # vehicles, plus their occupancy grids if the store has them; with
+    # perPath, also one figure per bot or vehicle
+    meta = store.readMeta(storePath)
+    jobs = []
+
+    if meta["kind"] == "random":
+        for t in range(meta["numTypes"]):
+            jobs.append(((t,), f"type{t + 1}.{format}", f"Type {t + 1} Robot Movement"))
+            if "occupancy" in meta:
+                jobs.append((("occupancy", t), f"type{t + 1}occupancy.{format}", f"Type {t + 1} Robot Occupancy"))
+            if perPath:
+                for r in range(meta["population"]):
+                    jobs.append(((t, r), f"type{t + 1}robot{r + 1}.{format}", f"Type {t + 1} Robot {r + 1} Movement"))
+    else:
+        jobs.append(((), f"vehicles.{format}", "All Vehicles Path Overview"))
+        if "occupancy" in meta:
+            jobs.append((("occupancy",), f"occupancy.{format}", "All Vehicles Occupancy"))
+        if perPath:
+            for i in range(meta["numLights"]):
+                jobs.append(((i,), f"vehicle{i + 1}.{format}", f"Vehicle {i + 1} Path"))
+
+    return [(storePath, index, os.path.join(folder, name), title, points, dpi) for index, name, title in jobs]
+
+def renderStore(storePath, folder, perPath=False, points=POINTS, workers=None, dpi=100, format="png"):
+    # Renders the figures of a result store into folder, spread over a
+    # process pool. Returns the paths of the written files.
+    os.makedirs(folder, exist_ok=True)
+    jobs = storeJobs(storePath, folder, perPath, points, dpi, format)
+
+    if workers == 1:
+        return [renderJob(job) for job in jobs]
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(renderJob, jobs, chunksize=max(1, len(jobs) // (4*(workers or os.cpu_count())))))
+
+def main():
+    parser = argparse.ArgumentParser(description="Render the paths of a result store to image files")
+    parser.add_argument("store", nargs="?", default=store.VEHICLE_STORE)
+    parser.add_argument("--output", default="figures")
+    parser.add_argument("--per-path", action="store_true")
+    parser.add_argument("--points", type=int, default=POINTS)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--dpi", type=int, default=100)
+    parser.add_argument("--format", default="png")
+    args = parser.parse_args()
+
+    files = renderStore(args.store, args.output, args.per_path, args.points, args.workers, args.dpi, args.format)
+    print(f"Rendered {len(files)} figures to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -1,22 +1,79 @@
 import agent
+import checkpoint
+import gridpaths
+import instrument
+import metrics
+import pipeline
+import stats
+import store
 import numpy as np
 
 class History():
-    def __init__(self, xHistory, yHistory):
-        # Stores the recorded x and y positions over time
+    def __init__(self, xHistory, yHistory, convergedAt=None, period=None):
+        # Stores the recorded x and y positions over time. For runs that
+        # were fast-forwarded, convergedAt is the history index from which
+        # positions repeat with the given period (1 for a halted vehicle).
         self.xHistory = xHistory
         self.yHistory = yHistory
+        self.convergedAt = convergedAt
+        self.period = period
 
-def simPopulation(focus, population, duration):
+class CompactHistory():
+    def __init__(self, xStart, yStart, v, packed, steps):
+        # History of a grid walker kept as its start point, velocity and
+        # one packed 2-bit heading code per step (see gridpaths.py). The x
+        # and y positions are each decoded the first time they are read.
+        self.xStart = xStart
+        self.yStart = yStart
+        self.v = v
+        self.packed = packed
+        self.steps = steps
+        self.convergedAt = None
+        self.period = None
+        self.decoded = [None, None] # Decoded x and y, once read
+
+    def axis(self, axis):
+        if self.decoded[axis] is None:
+            start = self.xStart if axis == 0 else self.yStart
+            self.decoded[axis] = gridpaths.decodeAxis(start, self.v, self.packed, self.steps, axis)
+        return self.decoded[axis]
+
+    @property
+    def xHistory(self):
+        return self.axis(0)
+
+    @property
+    def yHistory(self):
+        return self.axis(1)
+
+def compactHistory(xHistory, yHistory, v):
+    # Smallest exact form of a history walked at velocity v: packed
+    # heading codes for grid walks, else float32 positions if they
+    # round-trip, else the float64 positions as they are
+    packed = gridpaths.encode(xHistory, yHistory, v)
+    if packed is not None:
+        return CompactHistory(float(xHistory[0]), float(yHistory[0]), float(v), packed, len(xHistory) - 1)
+
+    x32 = xHistory.astype(np.float32)
+    y32 = yHistory.astype(np.float32)
+    if np.array_equal(x32, xHistory) and np.array_equal(y32, yHistory):
+        return History(x32, y32)
+    return History(xHistory, yHistory)
+
+def simPopulation(focus, population, duration, occupancy=None, compact=False):
     # Simulates a population of identical bots (same agent object),
-    # each run independently for the same duration.
+    # each run independently for the same duration. Every bot's path is
+    # also counted into occupancy (a stats.OccupancyGrid) if given. With
+    # compact, histories are kept in their compact form (see simBot).
     histories = []
     displacements = []
     explorations = []
 
     for i in range(population):
         # Run one bot simulation
-        history, displacement, exploration = simBot(focus, duration)
+        history, displacement, exploration = simBot(focus, duration, compact=compact)
+        if occupancy is not None:
+            occupancy.addHistory(history.xHistory, history.yHistory)
         histories.append(history)
         displacements.append(displacement)
         explorations.append(exploration)
@@ -24,75 +81,618 @@ def simPopulation(focus, population, duration):
     # Returns movement histories, displacement arrays, and exploration amounts
     return histories, displacements, explorations
 
-def simBot(focus, duration):
-    # Tracks x,y positions over time for a single bot
-    xHistory = np.zeros(duration + 1)
-    yHistory = np.zeros(duration + 1)
+class ExplorationGrid():
+    def __init__(self, size, bots=1, sparse=False, tile=64):
+        # Visited-cell tracker for one or more bots. The dense mode is a
+        # size × size boolean grid per bot that ignores cells outside it; the
+        # sparse mode stores tile × tile blocks on demand and keeps every cell.
+        self.size = size
+        self.bots = bots
+        self.sparse = sparse
+        self.tile = tile
 
-    # Initial position
-    xHistory[0] = focus.x
-    yHistory[0] = focus.y
-    
-    # 2D grid storing visited locations
-    pathing = []
+        if sparse:
+            self.tiles = {} # (bot, tile row, tile column) → boolean block
+        else:
+            self.cells = np.zeros((bots, size, size), dtype=bool)
 
-    # The grid dimensions are sqrt(duration) × sqrt(duration)
-    size = int(np.sqrt(duration))
+    def markCells(self, bots, j, k):
+        # Marks the individual cells (j, k) of the given bots as visited
+        if self.sparse:
+            tileJ = j // self.tile
+            tileK = k // self.tile
+            keys, inverse = np.unique(np.stack((bots, tileJ, tileK)), axis=1, return_inverse=True)
+            inverse = inverse.reshape(-1)
 
-    # Initialize a 2D grid of zeros
-    for i in range(size):
-        path = []
-        for j in range(size):
-            path.append(0)
-        pathing.append(path)
+            # Grow the grid one tile at a time as the walk reaches new areas
+            for n in range(keys.shape[1]):
+                key = tuple(int(value) for value in keys[:, n])
+                if key not in self.tiles:
+                    self.tiles[key] = np.zeros((self.tile, self.tile), dtype=bool)
+                inTile = inverse == n
+                self.tiles[key][j[inTile] % self.tile, k[inTile] % self.tile] = True
+        else:
+            # Ensure indexing stays in bounds to avoid crashes
+            inside = (0 <= j) & (j < self.size) & (0 <= k) & (k < self.size)
+            self.cells[bots[inside], j[inside], k[inside]] = True
 
-    # Start pathing from the grid center
-    posX = size // 2
-    posY = size // 2
+    def mark(self, posX, posY, xTravel, yTravel, bots=None):
+        # Marks the xTravel × yTravel block of cells starting at (posX, posY)
+        # for every entry in one vectorized operation. Each entry belongs to
+        # the matching bot in bots (one entry per bot by default).
+        posX = np.asarray(posX)
+        posY = np.asarray(posY)
+        cells = np.asarray(xTravel) * np.asarray(yTravel)
+        if not cells.any():
+            return
+
+        if bots is None:
+            bots = np.arange(len(cells))
+
+        # Expand each block into a flat list of (bot, j, k) cells
+        owner = np.repeat(np.arange(len(cells)), cells)
+        offset = np.arange(cells.sum()) - np.repeat(np.cumsum(cells) - cells, cells)
+        yTravel = np.asarray(yTravel)[owner]
+        self.markCells(np.asarray(bots)[owner], posX[owner] + offset // yTravel, posY[owner] + offset % yTravel)
+
+    def state(self):
+        # Visited cells as plain arrays, e.g. for a checkpoint
+        if self.sparse:
+            keys = np.array(list(self.tiles.keys()), dtype=np.int64).reshape(-1, 3)
+            blocks = np.array(list(self.tiles.values()), dtype=bool).reshape(-1, self.tile, self.tile)
+            return {"tileKeys": keys, "tileBlocks": blocks}
+        return {"cells": self.cells}
 
-    # Mark starting cell as visited
-    pathing[posX][posY] = 1
+    def restore(self, arrays):
+        # Visited cells saved by state()
+        if self.sparse:
+            self.tiles = {tuple(int(value) for value in key): np.array(block) for key, block in zip(arrays["tileKeys"], arrays["tileBlocks"])}
+        else:
+            self.cells = np.array(arrays["cells"])
+
+    def count(self):
+        # Number of visited cells for each bot
+        if self.sparse:
+            counts = np.zeros(self.bots, dtype=int)
+            for (bot, tileJ, tileK), block in self.tiles.items():
+                counts[bot] += np.count_nonzero(block)
+            return counts
+        return np.count_nonzero(self.cells.reshape(self.bots, -1), axis=1)
+
+# Walkers whose turn() draws a cardinal heading without looking at position
+# Walkers whose turn() draws a heading with agent.drawHeadings, under their
+# class's turning mode, without looking at position
+HEADING_WALKERS = (agent.RandomWalker, agent.TrulyRandomWalker, agent.RandomRandomWalker)
+
+def simBot(focus, duration, sparse=False, profiler=None, compact=False):
+    # Pass an instrument.Profiler to record time per phase. With compact,
+    # the history is stored as heading codes where possible (see
+    # compactHistory).
+    # Initial position
+    xStart = focus.x
+    yStart = focus.y
 
     # Simulate movement for the given duration
-    for i in range(duration):
-        focus.turn()  # Agent determines new heading
-        focus.step()  # Agent moves forward based on velocity
-        xHistory[i+1] = focus.x
-        yHistory[i+1] = focus.y
-
-        # Compute integer travel distances in x and y directions
-        xTravel = abs(int(focus.v * np.cos(focus.o)))
-        yTravel = abs(int(focus.v * np.sin(focus.o)))
-
-        # Mark every grid cell passed through as visited
-        for j in range(xTravel):
-            for k in range(yTravel):
-                # Ensure indexing stays in bounds to avoid crashes
-                if 0 <= j + posX < size and 0 <= k + posY < size:
-                    pathing[j + posX][k + posY] = 1
-        
-        # Update current grid position
-        posX += xTravel
-        posY += yTravel
-    
+    x, y, xTravel, yTravel = advanceBot(focus, duration, profiler)
+
+    # Tracks x,y positions over time for a single bot
+    with instrument.phase(profiler, "history"):
+        xHistory = np.concatenate(([xStart], x))
+        yHistory = np.concatenate(([yStart], y))
+
     # Count how many grid cells were visited
-    exploration = 0
-    
-    for i in range(size):
-        for j in range(size):
-            if pathing[i][j] == 1:
-                exploration += 1
+    with instrument.phase(profiler, "exploration"):
+        exploration = exploreSteps(xTravel, yTravel, int(np.sqrt(duration)), sparse)
     
     # Store path history
-    history = History(xHistory, yHistory)
+    if compact:
+        history = compactHistory(xHistory, yHistory, focus.v)
+    else:
+        history = History(xHistory, yHistory)
 
     # Displacement array: distance from origin at every time step
-    displacement = np.sqrt(xHistory**2 + yHistory**2)
+    with instrument.phase(profiler, "displacement"):
+        displacement = np.sqrt(xHistory**2 + yHistory**2)
+
+    if profiler is not None:
+        profiler.count("steps", duration)
 
     return history, displacement, exploration
 
-def runRandom(population, duration, numTypes):
-    # Creates each of the random walker types and simulates them
+def advanceBot(focus, steps, profiler=None):
+    # Moves a bot forward by steps steps, returning its x and y positions
+    # after every step and the integer travel distances of every step.
+    if type(focus) in HEADING_WALKERS:
+        # These walkers never look at their position, so pre-draw every
+        # heading turn() would pick (in the walker's turning mode) and
+        # build the path with a cumulative sum, giving the same results as
+        # stepping the agent. Any other walker is stepped below.
+        with instrument.phase(profiler, "turn"):
+            o = agent.drawHeadings(agent.randomSource(focus.rng), focus.turning, steps)
+
+        with instrument.phase(profiler, "step"):
+            # Per-step movement, exactly as computed by step()
+            xStep = focus.v*np.cos(o)
+            yStep = focus.v*np.sin(o)
+
+            # Running sums starting from the current position
+            x = np.cumsum(np.concatenate(([focus.x], xStep)))[1:]
+            y = np.cumsum(np.concatenate(([focus.y], yStep)))[1:]
+
+        # Leave the walker where it ended, as stepping it would
+        if steps > 0:
+            focus.x = x[-1]
+            focus.y = y[-1]
+            focus.o = o[-1]
+
+        return x, y, np.abs(xStep.astype(int)), np.abs(yStep.astype(int))
+
+    x = np.zeros(steps)
+    y = np.zeros(steps)
+
+    # Integer travel distances in x and y directions for every step
+    xTravel = np.zeros(steps, dtype=int)
+    yTravel = np.zeros(steps, dtype=int)
+
+    if profiler is not None:
+        advanceBotProfiled(focus, x, y, xTravel, yTravel, profiler)
+        return x, y, xTravel, yTravel
+
+    for i in range(steps):
+        focus.turn()  # Agent determines new heading
+        focus.step()  # Agent moves forward based on velocity
+        x[i] = focus.x
+        y[i] = focus.y
+
+        xTravel[i] = abs(int(focus.v * np.cos(focus.o)))
+        yTravel[i] = abs(int(focus.v * np.sin(focus.o)))
+
+    return x, y, xTravel, yTravel
+
+def advanceBotProfiled(focus, x, y, xTravel, yTravel, profiler):
+    # Same loop as advanceBot for stepped agents, timing every phase
+    clock = profiler.clock
+    turnTime = stepTime = historyTime = 0.0
+
+    for i in range(len(x)):
+        start = clock()
+        focus.turn()
+        turned = clock()
+        focus.step()
+        stepped = clock()
+        x[i] = focus.x
+        y[i] = focus.y
+        xTravel[i] = abs(int(focus.v * np.cos(focus.o)))
+        yTravel[i] = abs(int(focus.v * np.sin(focus.o)))
+        written = clock()
+
+        turnTime += turned - start
+        stepTime += stepped - turned
+        historyTime += written - stepped
+
+    profiler.add("turn", turnTime, len(x))
+    profiler.add("step", stepTime, len(x))
+    profiler.add("history", historyTime, len(x))
+
+def markSteps(grid, posX, posY, xTravel, yTravel):
+    # Marks a run of consecutive steps of one bot starting from grid cell
+    # (posX, posY) and returns the grid cell reached at the end of the run.
+    startX = posX + np.cumsum(xTravel) - xTravel
+    startY = posY + np.cumsum(yTravel) - yTravel
+    grid.mark(startX, startY, xTravel, yTravel, np.zeros(len(xTravel), dtype=int))
+
+    return posX + int(np.sum(xTravel)), posY + int(np.sum(yTravel))
+
+def exploreSteps(xTravel, yTravel, size, sparse=False):
+    # Replays a bot's integer travel distances on a size × size grid,
+    # starting from the grid center, and returns how many cells it visited.
+    grid = ExplorationGrid(size, sparse=sparse)
+
+    # Mark the starting cell and every cell passed through as visited
+    grid.markCells(np.zeros(1, dtype=int), np.array([size // 2]), np.array([size // 2]))
+    markSteps(grid, size // 2, size // 2, xTravel, yTravel)
+
+    return int(grid.count()[0])
+
+# Number of history entries produced per chunk by the streaming simulators
+CHUNK = 65536
+
+def chunkRanges(duration, chunk):
+    # Splits the duration + 1 history indices into [start, stop) chunks
+    return [(start, min(start + chunk, duration + 1)) for start in range(0, duration + 1, chunk)]
+
+def streamBot(focus, duration, chunk=CHUNK, grid=None):
+    # Streaming version of simBot: yields (start, xHistory, yHistory,
+    # displacement) for history indices start..start+len-1, one chunk at a
+    # time, so memory stays constant whatever the duration. Visited cells
+    # are marked in grid (an ExplorationGrid) when one is given.
+    size = int(np.sqrt(duration))
+    posX = size // 2
+    posY = size // 2
+    if grid is not None:
+        grid.markCells(np.zeros(1, dtype=int), np.array([posX]), np.array([posY]))
+
+    for start, stop in chunkRanges(duration, chunk):
+        # The first chunk also holds the initial position
+        if start == 0:
+            xStart = focus.x
+            yStart = focus.y
+            x, y, xTravel, yTravel = advanceBot(focus, stop - 1)
+            x = np.concatenate(([xStart], x))
+            y = np.concatenate(([yStart], y))
+        else:
+            x, y, xTravel, yTravel = advanceBot(focus, stop - start)
+
+        if grid is not None:
+            posX, posY = markSteps(grid, posX, posY, xTravel, yTravel)
+
+        yield start, x, y, np.sqrt(x**2 + y**2)
+
+def streamVehicle(vehicle, duration, light, chunk=CHUNK, controller="think"):
+    # Streaming version of simVehicle: yields (start, xHistory, yHistory)
+    # for history indices start..start+len-1, one chunk at a time.
+    size = int(np.sqrt(duration))
+    think = getattr(vehicle, controller)
+
+    for start, stop in chunkRanges(duration, chunk):
+        # Plain vehicles run the fused kernel for the whole chunk
+        if type(vehicle) is agent.Braitenberg and type(light) is agent.LightSource:
+            xStart = vehicle.x
+            yStart = vehicle.y
+            xHistory, yHistory, converged = vehicle.advance(light, duration, stop - max(start, 1), controller)
+            if start == 0:
+                xHistory = np.concatenate(([xStart], xHistory))
+                yHistory = np.concatenate(([yStart], yHistory))
+            yield start, xHistory, yHistory
+            continue
+
+        xHistory = np.zeros(stop - start)
+        yHistory = np.zeros(stop - start)
+
+        for n in range(stop - start):
+            # Index 0 is the starting position
+            if start + n > 0:
+                vehicle.sense(light, size)
+                think(duration)
+                vehicle.move()
+            xHistory[n] = vehicle.x
+            yHistory[n] = vehicle.y
+
+        yield start, xHistory, yHistory
+
+def streamVehicleBatched(vehicles, duration, lightX, lightY, chunk=CHUNK, controller="think", report=False):
+    # Streaming version of simVehicleBatched: yields (start, xHistory,
+    # yHistory) with one row per vehicle, one chunk at a time. With report,
+    # also yields the history index each vehicle halted at so far (-1 if
+    # it has not), as simVehicleBatched reports it for the whole run.
+    convergedAt = np.full(len(vehicles), -1)
+
+    for start, stop in chunkRanges(duration, chunk):
+        # The first chunk also holds the starting positions
+        if start == 0:
+            xHistory, yHistory, halted = simVehicleBatched(vehicles, duration, lightX, lightY, controller, True, stop - 1)
+        else:
+            xHistory, yHistory, halted = simVehicleBatched(vehicles, duration, lightX, lightY, controller, True, stop - start)
+            xHistory = xHistory[:, 1:]
+            yHistory = yHistory[:, 1:]
+            # Index 0 of this chunk's run is history index start - 1
+            halted[halted >= 0] += start - 1
+
+        # A halted vehicle halts again on every later chunk; keep the first
+        first = (convergedAt < 0) & (halted >= 0)
+        convergedAt[first] = halted[first]
+
+        if report:
+            yield start, xHistory, yHistory, convergedAt.copy()
+        else:
+            yield start, xHistory, yHistory
+
+def runBotStreaming(focus, duration, path, chunk=CHUNK, sparse=False):
+    # Streams one bot straight into an on-disk store (a one-type, one-bot
+    # random store) and returns its exploration. Only a couple of chunks
+    # are ever held in memory, apart from the exploration grid, and each
+    # is written out by a pipeline.Writer while the next one is simulated.
+    columns = createRandomStore(path, 1, duration, 1, chunk=chunk)
+    grid = ExplorationGrid(int(np.sqrt(duration)), sparse=sparse)
+
+    with pipeline.Writer() as writer:
+        for start, x, y, displacement in streamBot(focus, duration, chunk, grid):
+            writer.put(saveChunk, columns, (0, 0), start, {"x": x, "y": y, "displacements": displacement})
+
+    exploration = int(grid.count()[0])
+    columns["explorations"][0, 0] = exploration
+    store.flushStore(columns)
+
+    return exploration
+
+def runVehicleStreaming(vehicles, duration, lightX, lightY, path, chunk=CHUNK, controller="think"):
+    # Streams a batch of vehicles straight into an on-disk vehicle store,
+    # holding only a couple of chunks of every trajectory in memory. Each
+    # chunk is written out by a pipeline.Writer while the next one is
+    # simulated.
+    columns = createVehicleStore(path, duration, len(vehicles), controller=controller, chunk=chunk)
+    columns["lights"][:, 0] = lightX
+    columns["lights"][:, 1] = lightY
+
+    with pipeline.Writer() as writer:
+        for start, xHistory, yHistory, convergedAt in streamVehicleBatched(vehicles, duration, lightX, lightY, chunk, controller, report=True):
+            writer.put(saveChunk, columns, (slice(None),), start, {"x": xHistory, "y": yHistory})
+
+        writer.put(saveConverged, columns, convergedAt)
+
+def saveConverged(columns, convergedAt):
+    columns["convergedAt"][:] = convergedAt
+    store.flushStore(columns)
+
+def saveChunk(columns, index, start, chunk):
+    # Writes history entries start.. of every column in chunk (name →
+    # values) for the rows selected by index, then flushes the store
+    for name, values in chunk.items():
+        columns[name][index + (slice(start, start + np.shape(values)[-1]),)] = values
+    store.flushStore(columns)
+
+def walkPopulation(walkers, duration, grid):
+    # Advances a WalkerPopulation for the given duration, marking visited
+    # cells in grid. Yields the history index after the initial state and
+    # after every step, so callers can read walkers.x and walkers.y.
+    size = int(np.sqrt(duration))
+
+    # Start pathing from the grid center
+    posX = np.full(len(walkers.x), size // 2)
+    posY = np.full(len(walkers.x), size // 2)
+
+    # Mark starting cells as visited
+    grid.markCells(np.arange(len(walkers.x)), posX, posY)
+    yield 0
+
+    # Simulate movement for the given duration
+    for i in range(duration):
+        posX, posY = walkStep(walkers, grid, posX, posY)
+        yield i + 1
+
+def walkStep(walkers, grid, posX, posY):
+    # One turn → step of a WalkerPopulation, marking the grid cells passed
+    # through from (posX, posY). Returns the new grid positions.
+    walkers.turn()  # Every bot picks a new heading
+    walkers.step()  # Every bot moves forward
+
+    # Integer travel distances, truncated like int() in simBot
+    xTravel = np.abs((walkers.v * np.cos(walkers.o)).astype(int))
+    yTravel = np.abs((walkers.v * np.sin(walkers.o)).astype(int))
+
+    # Mark every grid cell passed through as visited
+    grid.mark(posX, posY, xTravel, yTravel)
+
+    # Update current grid positions
+    return posX + xTravel, posY + yTravel
+
+def simPopulationBatched(focus, population, duration, rng=None, sparse=False, occupancy=None, compact=False):
+    # Simulates a population of bots that all start from the state of focus,
+    # advancing every bot together as arrays instead of one object at a time.
+    # Positions are counted into occupancy (a stats.OccupancyGrid) step by
+    # step if given. With compact, only every step's heading code is kept
+    # and histories come back as CompactHistory objects.
+    walkers = agent.WalkerPopulation(focus, population, rng)
+    xStart = walkers.x.copy()
+    yStart = walkers.y.copy()
+
+    if compact and walkers.turning != "grid":
+        raise ValueError("Compact paths need grid turning, not Part 1 turning")
+
+    if compact:
+        # One heading code per bot and step, and displacements kept as they come
+        codes = np.zeros((population, duration), dtype=np.uint8)
+        displacements = np.zeros((population, duration + 1))
+    else:
+        # Tracks x,y positions over time, one row per bot
+        xHistory = np.zeros((population, duration + 1))
+        yHistory = np.zeros((population, duration + 1))
+
+    # One sqrt(duration) × sqrt(duration) visited grid per bot
+    grid = ExplorationGrid(int(np.sqrt(duration)), population, sparse)
+
+    for i in walkPopulation(walkers, duration, grid):
+        if compact:
+            if i > 0:
+                codes[:, i-1] = gridpaths.headingCodes(walkers.o)
+            displacements[:, i] = np.sqrt(walkers.x**2 + walkers.y**2)
+        else:
+            xHistory[:, i] = walkers.x
+            yHistory[:, i] = walkers.y
+        if occupancy is not None:
+            occupancy.add(walkers.x, walkers.y, i)
+
+    # Count how many grid cells each bot visited
+    explorations = grid.count()
+
+    if compact:
+        packed = gridpaths.pack(codes)
+        histories = [CompactHistory(xStart[i], yStart[i], walkers.v[i], packed[i], duration) for i in range(population)]
+        return histories, list(displacements), explorations.tolist()
+
+    # Displacement arrays: distance from origin at every time step
+    displacements = np.sqrt(xHistory**2 + yHistory**2)
+
+    histories = [History(xHistory[i], yHistory[i]) for i in range(population)]
+
+    return histories, list(displacements), explorations.tolist()
+
+def simPopulationStats(focus, population, duration, rng=None, sparse=False, batch=None, quantileEvery=0):
+    # Runs the batched walker engine without keeping any history, feeding
+    # every time step into online accumulators instead. Bots are run batch
+    # at a time (all at once by default), so memory does not grow with
+    # either population or duration. Returns a stats.PopulationStats.
+    summary = stats.PopulationStats(duration, quantileEvery)
+    batch = batch or population
+
+    for first in range(0, population, batch):
+        addPopulationBatch(summary, focus, min(batch, population - first), duration, rng, sparse)
+
+    return summary
+
+def addPopulationBatch(summary, focus, size, duration, rng=None, sparse=False):
+    # Runs size more bots and feeds them into summary (a stats.PopulationStats)
+    walkers = agent.WalkerPopulation(focus, size, rng)
+    grid = ExplorationGrid(int(np.sqrt(duration)), size, sparse)
+
+    for i in walkPopulation(walkers, duration, grid):
+        summary.addDisplacement(i, np.sqrt(walkers.x**2 + walkers.y**2))
+
+    summary.addExploration(grid.count())
+
+def runAdaptive(runBatch, running, batch, budget, tolerance=0.0, relative=0.05, confidence=0.95, minimum=2):
+    # Calls runBatch(size) for batches of up to batch samples, each adding
+    # its samples to running (a stats.RunningStats), until the confidence
+    # interval on the mean is within tolerance or relative × |mean| (after
+    # at least minimum batches) or budget samples have been drawn. Returns
+    # a log entry per batch: samples so far, mean, half-width and whether
+    # the requested precision was reached.
+    log = []
+    drawn = 0
+    while drawn < budget:
+        size = min(batch, budget - drawn)
+        runBatch(size)
+        drawn += size
+
+        reached = len(log) + 1 >= minimum and running.precise(tolerance, relative, confidence)
+        log.append({
+            "samples": int(running.count),
+            "mean": float(running.mean),
+            "halfWidth": float(running.halfWidth(confidence)),
+            "precise": reached,
+        })
+        if reached:
+            break
+
+    return log
+
+def simPopulationAdaptive(focus, duration, target="exploration", batch=32, budget=1024, tolerance=0.0, relative=0.05, confidence=0.95, rng=None, sparse=False, quantileEvery=0):
+    # simPopulationStats with the population sized by the results: bots
+    # are run batch at a time until the mean of target ("exploration" or
+    # "finalDisplacement") is known to the requested precision (see
+    # runAdaptive) or budget bots have run. Returns the stats.PopulationStats
+    # and the per-batch log.
+    summary = stats.PopulationStats(duration, quantileEvery)
+    running = getattr(summary, target)
+
+    def runBatch(size):
+        addPopulationBatch(summary, focus, size, duration, rng, sparse)
+
+    return summary, runAdaptive(runBatch, running, batch, budget, tolerance, relative, confidence)
+
+def makeWalker(kind, duration, rng=None):
+    # Instantiates random walker type 0, 1 or 2
+    if kind == 0:
+        return agent.RandomWalker(rng)
+    if kind == 1:
+        return agent.TrulyRandomWalker(duration, rng)
+    return agent.RandomRandomWalker(duration, rng)
+
+# Half-width of a walker type's occupancy grid, in typical distances from
+# the start (see walkerOccupancy)
+OCCUPANCY_MARGIN = 3
+
+def walkerOccupancy(focus, duration, windows=1, extent=None, bins=256):
+    # Occupancy grid for the bots of one walker type, centred on where the
+    # focus walker (and so every bot) starts. A bot moves v per step in
+    # random directions, so it typically ends up v·sqrt(duration) away;
+    # unless extent is given, the grid reaches OCCUPANCY_MARGIN times that.
+    if extent is None:
+        extent = OCCUPANCY_MARGIN*float(focus.v)*np.sqrt(duration)
+    return stats.OccupancyGrid(extent, bins, windows, duration, (focus.x, focus.y))
+
+def createRandomStore(path, population, duration, numTypes, occupancy=None, compact=False, **meta):
+    # Columnar store for every walker type's histories, displacements and
+    # explorations, returned as writable arrays. With occupancy (a
+    # stats.OccupancyGrid), also one occupancy grid per walker type. A
+    # compact store keeps every path as its start point, velocity and
+    # packed heading codes instead, which store.Store decodes on access.
+    steps = (numTypes, population, duration + 1)
+    columns = {
+        "x": (steps, "float64"),
+        "y": (steps, "float64"),
+        "displacements": (steps, "float64"),
+        "explorations": ((numTypes, population), "int64"),
+    }
+    if compact:
+        columns = {
+            "starts": ((numTypes, population, 2), "float64"),
+            "velocities": ((numTypes, population), "float64"),
+            "codes": ((numTypes, population, (duration + 3)//4), "uint8"),
+            "explorations": ((numTypes, population), "int64"),
+        }
+        meta["compact"] = True
+    if occupancy is not None:
+        addOccupancyColumns(columns, meta, occupancy, (numTypes,))
+    meta.update(kind="random", population=population, duration=duration, numTypes=numTypes)
+    return store.createStore(path, columns, meta)
+
+def createVehicleStore(path, duration, numLights, occupancy=None, **meta):
+    # Columnar store for every light trial's history, light position and
+    # the history index its vehicle halted at (-1 if it never did, see
+    # simVehicleBatched), returned as writable arrays. With occupancy (a
+    # stats.OccupancyGrid), also one occupancy grid for all vehicles.
+    columns = {
+        "x": ((numLights, duration + 1), "float64"),
+        "y": ((numLights, duration + 1), "float64"),
+        "lights": ((numLights, 2), "float64"),
+        "convergedAt": ((numLights,), "int64"),
+    }
+    if occupancy is not None:
+        addOccupancyColumns(columns, meta, occupancy, ())
+    meta.update(kind="vehicle", duration=duration, numLights=numLights)
+    columns = store.createStore(path, columns, meta)
+    columns["convergedAt"][:] = -1
+    return columns
+
+def addOccupancyColumns(columns, meta, occupancy, shape):
+    # Columns holding shape occupancy grids with the bins and windows of
+    # occupancy. Every grid keeps its own square, as (centre x, centre y,
+    # extent) in occupancyBounds.
+    extent, bins, windows, duration, center = occupancy.layout()
+    columns["occupancy"] = (shape + occupancy.counts.shape, "int64")
+    columns["occupancyOutside"] = (shape + occupancy.outside.shape, "int64")
+    columns["occupancyBounds"] = (shape + (3,), "float64")
+    meta["occupancy"] = {"bins": bins, "windows": windows, "duration": duration}
+
+def saveOccupancy(columns, index, occupancy):
+    columns["occupancy"][index] = occupancy.counts
+    columns["occupancyOutside"][index] = occupancy.outside
+    columns["occupancyBounds"][index] = occupancy.center + (occupancy.extent,)
+
+def saveRandom(columns, i, histories, displacements, explorations):
+    # Save results of walker type i for later analysis
+    if "codes" in columns:
+        # Compact store: displacements are derived from the paths on access
+        for r, history in enumerate(histories):
+            if not isinstance(history, CompactHistory):
+                history = compactHistory(history.xHistory, history.yHistory, np.hypot(history.xHistory[1] - history.xHistory[0], history.yHistory[1] - history.yHistory[0]))
+            if not isinstance(history, CompactHistory):
+                raise ValueError(f"Bot {r} of type {i} is not a grid walk and cannot go into a compact store")
+            columns["starts"][i, r] = (history.xStart, history.yStart)
+            columns["velocities"][i, r] = history.v
+            columns["codes"][i, r] = history.packed
+        columns["explorations"][i] = explorations
+        return
+
+    for r, history in enumerate(histories):
+        columns["x"][i, r] = history.xHistory
+        columns["y"][i, r] = history.yHistory
+    columns["displacements"][i] = displacements
+    columns["explorations"][i] = explorations
+
+def runRandom(population, duration, numTypes, path=store.RANDOM_STORE, windows=1, every=0, compact=False, extent=None, bins=256):
+    # Creates each of the random walker types and simulates them. Each
+    # type's occupancy is counted on a grid of bins × bins cells around
+    # its start (see walkerOccupancy, extent sets the half-width). With
+    # every set, the run is checkpointed every that many steps and can be
+    # resumed (see runRandomResumable). With compact, paths are saved as
+    # packed heading codes (see gridpaths.py).
+    if every:
+        if compact:
+            raise ValueError("Checkpointed runs save full positions, compact is not supported")
+        return runRandomResumable(population, duration, numTypes, path, windows, every, extent, bins)
+
     agents = []
 
     # Instantiate the three different random walker types
@@ -104,17 +704,115 @@ def runRandom(population, duration, numTypes):
     agents.append(secondBorn)
     agents.append(thirdBorn)
 
-    # Run population simulations for the selected number of agent types
-    for i in range(numTypes):
-        histories, displacements, explorations = simPopulation(agents[i], population, duration)
+    columns = createRandomStore(path, population, duration, numTypes, walkerOccupancy(agents[0], duration, windows, extent, bins), compact)
+
+    # Run population simulations for the selected number of agent types;
+    # the writer thread saves each type while the next one is simulated
+    with pipeline.Writer() as writer:
+        for i in range(numTypes):
+            # Where this type's bots spent their time
+            occupancy = walkerOccupancy(agents[i], duration, windows, extent, bins)
+            histories, displacements, explorations = simPopulationBatched(agents[i], population, duration, occupancy=occupancy, compact=compact)
 
-        # Save results for later analysis
-        np.save(f"histories{i}.npy", histories)
-        np.save(f"displacements{i}.npy", displacements)
-        np.save(f"explorations{i}.npy", explorations)
+            # Save results for later analysis
+            writer.put(saveRandom, columns, i, histories, displacements, explorations)
+            writer.put(saveOccupancy, columns, i, occupancy)
+
+        writer.put(store.flushStore, columns)
+
+def runRandomResumable(population, duration, numTypes, path, windows, every, extent=None, bins=256):
+    # runRandom writing histories into the store as they are made and
+    # checkpointing every `every` steps: walker states, grid positions,
+    # exploration and occupancy grids and the RNG state. Called again
+    # after an interruption, it resumes from the last checkpoint and gives
+    # exactly the results of an uninterrupted run.
+    size = int(np.sqrt(duration))
+    run = {"kind": "random", "population": population, "duration": duration, "numTypes": numTypes, "windows": windows, "extent": extent, "bins": bins}
+    checkpointFile = checkpoint.checkpointPath(path)
+    header, arrays = checkpoint.load(checkpointFile)
 
-def simVehicle(vehicle, duration, light):
+    agents = [agent.RandomWalker(), agent.TrulyRandomWalker(duration), agent.RandomRandomWalker(duration)]
+    if header is None:
+        columns = createRandomStore(path, population, duration, numTypes, walkerOccupancy(agents[0], duration, windows, extent, bins))
+        first, step = 0, 0
+    else:
+        checkpoint.checkRun(header, run)
+        columns = store.openStore(path)
+        first, step = header["type"], header["step"]
+        for focus, (x, y, o, v) in zip(agents, arrays["foci"]):
+            focus.x, focus.y, focus.o, focus.v = x, y, o, v
+        checkpoint.setRngState(np.random, header["rng"])
+
+    foci = np.array([[focus.x, focus.y, focus.o, focus.v] for focus in agents], dtype=float)
+
+    for i in range(first, numTypes):
+        walkers = agent.WalkerPopulation(agents[i], population)
+        grid = ExplorationGrid(size, population)
+        occupancy = walkerOccupancy(agents[i], duration, windows, extent, bins)
+        posX = np.full(population, size // 2)
+        posY = np.full(population, size // 2)
+
+        if i == first and header is not None:
+            walkers.x, walkers.y, walkers.o, walkers.v = arrays["x"], arrays["y"], arrays["o"], arrays["v"]
+            posX, posY = arrays["posX"], arrays["posY"]
+            grid.restore(arrays)
+            occupancy.counts, occupancy.outside = arrays["occupancy"], arrays["occupancyOutside"]
+        else:
+            step = 0
+            grid.markCells(np.arange(population), posX, posY)
+            columns["x"][i, :, 0] = walkers.x
+            columns["y"][i, :, 0] = walkers.y
+            columns["displacements"][i, :, 0] = np.sqrt(walkers.x**2 + walkers.y**2)
+            occupancy.add(walkers.x, walkers.y, 0)
+
+        while step < duration:
+            last = min(step + every, duration)
+            xHistory = np.zeros((population, last - step))
+            yHistory = np.zeros((population, last - step))
+            for n in range(last - step):
+                posX, posY = walkStep(walkers, grid, posX, posY)
+                xHistory[:, n] = walkers.x
+                yHistory[:, n] = walkers.y
+                occupancy.add(walkers.x, walkers.y, step + n + 1)
+
+            columns["x"][i, :, step+1:last+1] = xHistory
+            columns["y"][i, :, step+1:last+1] = yHistory
+            columns["displacements"][i, :, step+1:last+1] = np.sqrt(xHistory**2 + yHistory**2)
+            store.flushStore(columns)
+            step = last
+
+            state = {"x": walkers.x, "y": walkers.y, "o": walkers.o, "v": walkers.v, "posX": posX, "posY": posY, "foci": foci,
+                     "occupancy": occupancy.counts, "occupancyOutside": occupancy.outside}
+            state.update(grid.state())
+            checkpoint.save(checkpointFile, {"run": run, "type": i, "step": step, "rng": checkpoint.rngState(np.random)}, state)
+
+        columns["explorations"][i] = grid.count()
+        saveOccupancy(columns, i, occupancy)
+
+    store.flushStore(columns)
+    checkpoint.remove(checkpointFile)
+
+def simVehicle(vehicle, duration, light, controller="think", profiler=None, window=0):
     # Simulates a single Braitenberg vehicle moving toward a light source
+    # ("think", or "thinkWorldTravel" for World-Wide movement). Pass an
+    # instrument.Profiler to record time per phase.
+    if profiler is not None:
+        return simVehicleProfiled(vehicle, duration, light, controller, profiler)
+
+    if type(vehicle) is agent.Braitenberg and type(light) is agent.LightSource:
+        # Plain vehicles run the fused kernel, which gives the same results
+        # and fast-forwards once the vehicle halts (or, with window set,
+        # exactly repeats a state within window steps, see
+        # agent.Braitenberg.advance)
+        xStart = vehicle.x
+        yStart = vehicle.y
+        x, y, converged = vehicle.advance(light, duration, duration, controller, window)
+        history = History(np.concatenate(([xStart], x)), np.concatenate(([yStart], y)))
+        if converged is not None:
+            history.convergedAt = converged[0] + 1
+            history.period = converged[1]
+        return history
+
     xHistory = np.zeros(duration + 1)
     yHistory = np.zeros(duration + 1)
 
@@ -122,10 +820,12 @@ def simVehicle(vehicle, duration, light):
     xHistory[0] = vehicle.x
     yHistory[0] = vehicle.y
 
+    think = getattr(vehicle, controller)
+
     # Simulation loop
     for i in range(duration):
         vehicle.sense(light, int(np.sqrt(duration)))     # Detects light intensity
-        vehicle.think(duration)  # Can use thinkWorldWide() instead for 10,000 steps for World-Wide movement
+        think(duration)          # Converts sensor readings into motor commands
         vehicle.move()           # Applies movement based on sensor → motor mapping
         xHistory[i+1] = vehicle.x
         yHistory[i+1] = vehicle.y
@@ -135,30 +835,249 @@ def simVehicle(vehicle, duration, light):
 
     return history
 
-def runVehicle(duration, numLights):
-    # Runs a Braitenberg simulation for multiple random light source placements
-    for i in range(numLights):
-        light = agent.LightSource(int(np.sqrt(duration)))  # Random light location
-        vehicle = agent.Braitenberg()                      # New vehicle instance
+def simVehicleProfiled(vehicle, duration, light, controller, profiler):
+    # Method-by-method version of simVehicle that times sense, think, move
+    # and history writes, and counts steps spent halted by the stop rule
+    clock = profiler.clock
+    size = int(np.sqrt(duration))
+    think = getattr(vehicle, controller)
+    senseTime = thinkTime = moveTime = historyTime = 0.0
+    halted = 0
+
+    xHistory = np.zeros(duration + 1)
+    yHistory = np.zeros(duration + 1)
+    xHistory[0] = vehicle.x
+    yHistory[0] = vehicle.y
+
+    for i in range(duration):
+        start = clock()
+        vehicle.sense(light, size)
+        sensed = clock()
+        think(duration)
+        thought = clock()
+        vehicle.move()
+        moved = clock()
+        xHistory[i+1] = vehicle.x
+        yHistory[i+1] = vehicle.y
+        written = clock()
+
+        senseTime += sensed - start
+        thinkTime += thought - sensed
+        moveTime += moved - thought
+        historyTime += written - moved
+
+        # Same condition think() uses to stop the motors
+        if vehicle.ls < 0.5 or vehicle.rs < 0.5:
+            halted += 1
+
+    profiler.add("sense", senseTime, duration)
+    profiler.add(controller, thinkTime, duration)
+    profiler.add("move", moveTime, duration)
+    profiler.add("history", historyTime, duration)
+    profiler.count("steps", duration)
+    profiler.count("haltedSteps", halted)
+
+    return History(xHistory, yHistory)
+
+def simVehicleBatched(vehicles, duration, lightX, lightY, controller="think", report=False, steps=None):
+    # Simulates a batch of Braitenberg vehicles, each with its own light,
+    # stepping every vehicle together with the same sense → think → move
+    # dynamics as simVehicle. A vehicle that halts stays put for the rest
+    # of the run, so it is dropped from the stepped batch and its history
+    # filled in bulk; the loop ends once every vehicle has halted. With
+    # report, also returns the history index each vehicle halted at (-1
+    # if it never did). steps (duration by default) runs only part of a
+    # duration-long run, continuing from the vehicles' current state.
+    steps = duration if steps is None else steps
+    xHistory = np.zeros((len(vehicles), steps + 1))
+    yHistory = np.zeros((len(vehicles), steps + 1))
+    convergedAt = np.full(len(vehicles), -1)
+
+    # Starting positions
+    xHistory[:, 0] = vehicles.x
+    yHistory[:, 0] = vehicles.y
+
+    # Vehicles still moving, by index into vehicles, and their lights
+    active = np.arange(len(vehicles))
+    batch = vehicles
+    lightX = np.broadcast_to(lightX, len(vehicles))
+    lightY = np.broadcast_to(lightY, len(vehicles))
+
+    # Simulation loop
+    for i in range(steps):
+        if len(active) == 0:
+            break
+
+        batch.sense(lightX, lightY, int(np.sqrt(duration)))
+        getattr(batch, controller)(duration) # "think" or "thinkWorldTravel"
+        batch.move()
+        xHistory[active, i+1] = batch.x
+        yHistory[active, i+1] = batch.y
+
+        halted = (batch.ls < 0.5) | (batch.rs < 0.5)
+        if halted.any():
+            done = active[halted]
+            convergedAt[done] = i + 1
+            xHistory[done, i+2:] = batch.x[halted, None]
+            yHistory[done, i+2:] = batch.y[halted, None]
+            if batch is not vehicles:
+                vehicles.put(done, batch.take(halted))
+
+            keep = ~halted
+            active = active[keep]
+            batch = batch.take(keep)
+            lightX = lightX[keep]
+            lightY = lightY[keep]
+
+    if batch is not vehicles:
+        vehicles.put(active, batch)
+
+    if report:
+        return xHistory, yHistory, convergedAt
+    return xHistory, yHistory
+
+def simVehicleField(vehicles, duration, field, controller="think"):
+    # Simulates a batch of vehicles that all sense the same agent.LightField
+    xHistory = np.zeros((len(vehicles), duration + 1))
+    yHistory = np.zeros((len(vehicles), duration + 1))
+
+    # Starting positions
+    xHistory[:, 0] = vehicles.x
+    yHistory[:, 0] = vehicles.y
+
+    think = getattr(vehicles, controller)
+
+    for i in range(duration):
+        vehicles.senseField(field, int(np.sqrt(duration)))
+        think(duration)
+        vehicles.move()
+        xHistory[:, i+1] = vehicles.x
+        yHistory[:, i+1] = vehicles.y
+
+    return xHistory, yHistory
+
+def simVehicleGrid(vehicles, duration, lightX, lightY, controller="think"):
+    # Runs every vehicle against every light, returning N × M × (duration + 1)
+    # trajectories for N vehicles and M lights.
+    numVehicles = len(vehicles)
+    numLights = len(lightX)
+
+    pairs = vehicles.repeat(numLights)
+    xHistory, yHistory = simVehicleBatched(pairs, duration, np.tile(lightX, numVehicles), np.tile(lightY, numVehicles), controller)
+
+    shape = (numVehicles, numLights, duration + 1)
+    return xHistory.reshape(shape), yHistory.reshape(shape)
+
+def runVehicle(duration, numLights, controller="think", rng=None, path=store.VEHICLE_STORE, windows=1, every=0, chunk=CHUNK):
+    # Runs a Braitenberg simulation for multiple random light source placements,
+    # one vehicle per light, all light trials advancing together. With every
+    # set, the run is checkpointed every that many steps and can be resumed
+    # (see runVehicleResumable).
+    rng = agent.randomSource(rng)
+    if every:
+        return runVehicleResumable(duration, numLights, controller, rng, path, windows, every)
+
+    lightX, lightY = agent.placeLights(numLights, int(np.sqrt(duration)), rng)  # Random light locations
+    vehicles = agent.BraitenbergBatch(numLights, rng)                          # One vehicle per light
+
+    # Where the vehicles spent their time, over twice the range lights are
+    # placed in
+    occupancy = stats.OccupancyGrid(2*int(np.sqrt(duration)), windows=windows, duration=duration)
+
+    columns = createVehicleStore(path, duration, numLights, occupancy, controller=controller)
+    columns["lights"][:, 0] = lightX
+    columns["lights"][:, 1] = lightY
+
+    # Simulate vehicle behavior chunk by chunk of history entries; the
+    # writer thread saves each chunk while the next one is simulated
+    with pipeline.Writer() as writer:
+        for start, xHistory, yHistory, convergedAt in streamVehicleBatched(vehicles, duration, lightX, lightY, chunk, controller, report=True):
+            occupancy.add(xHistory, yHistory, np.arange(start, start + xHistory.shape[1]))
+            writer.put(saveChunk, columns, (slice(None),), start, {"x": xHistory, "y": yHistory})
+
+        # Save the occupancy grid and halting steps once every chunk is done
+        writer.put(saveOccupancy, columns, (), occupancy)
+        writer.put(saveConverged, columns, convergedAt)
+
+def simVehicleAdaptive(duration, controller="think", batch=16, budget=1024, tolerance=0.0, relative=0.05, confidence=0.95, rng=None):
+    # Light trials as in runVehicle, run batch at a time until the mean
+    # fitness score (visualize.getTotalFitnessScore over every light so
+    # far) is known to the requested precision (see runAdaptive) or budget
+    # lights have been tried. Returns the stats.RunningStats of the scores
+    # and the per-batch log.
+    running = stats.RunningStats()
+
+    def runBatch(size):
+        lightX, lightY = agent.placeLights(size, int(np.sqrt(duration)), rng)
+        vehicles = agent.BraitenbergBatch(size, rng)
+        xHistory, yHistory = simVehicleBatched(vehicles, duration, lightX, lightY, controller)
+        running.add(metrics.fitnessScores(xHistory, yHistory, lightX, lightY))
+
+    return running, runAdaptive(runBatch, running, batch, budget, tolerance, relative, confidence)
+
+def runVehicleResumable(duration, numLights, controller, rng, path, windows, every):
+    # runVehicle writing histories into the store as they are made and
+    # checkpointing every `every` steps: every vehicle's position,
+    # orientation, sensor and motor values and gains, the occupancy grid
+    # and the RNG state. Called again after an interruption, it resumes
+    # from the last checkpoint and gives exactly the results of an
+    # uninterrupted run.
+    run = {"kind": "vehicle", "duration": duration, "numLights": numLights, "controller": controller, "windows": windows}
+    checkpointFile = checkpoint.checkpointPath(path)
+    header, arrays = checkpoint.load(checkpointFile)
+
+    lightX, lightY = agent.placeLights(numLights, int(np.sqrt(duration)), rng)
+    vehicles = agent.BraitenbergBatch(numLights, rng)
+    occupancy = stats.OccupancyGrid(2*int(np.sqrt(duration)), windows=windows, duration=duration)
+
+    if header is None:
+        columns = createVehicleStore(path, duration, numLights, occupancy, controller=controller)
+        columns["lights"][:, 0] = lightX
+        columns["lights"][:, 1] = lightY
+        columns["x"][:, 0] = vehicles.x
+        columns["y"][:, 0] = vehicles.y
+        occupancy.add(vehicles.x, vehicles.y, 0)
+        step = 0
+    else:
+        checkpoint.checkRun(header, run)
+        columns = store.openStore(path)
+        lightX, lightY = arrays["lightX"], arrays["lightY"]
+        for name, value in arrays.items():
+            if name.startswith("vehicles."):
+                setattr(vehicles, name[len("vehicles."):], value)
+        occupancy.counts, occupancy.outside = arrays["occupancy"], arrays["occupancyOutside"]
+        checkpoint.setRngState(rng, header["rng"])
+        step = header["step"]
+
+    while step < duration:
+        last = min(step + every, duration)
+        xHistory, yHistory, halted = simVehicleBatched(vehicles, duration, lightX, lightY, controller, True, last - step)
 
-        # Simulate vehicle behavior
-        history = simVehicle(vehicle, duration, light)
+        columns["x"][:, step+1:last+1] = xHistory[:, 1:]
+        columns["y"][:, step+1:last+1] = yHistory[:, 1:]
+        # Keep the first halt; index 0 of this segment is history index step
+        first = (columns["convergedAt"] < 0) & (halted >= 0)
+        columns["convergedAt"][first] = halted[first] + step
+        occupancy.add(xHistory[:, 1:], yHistory[:, 1:], np.arange(step + 1, last + 1))
+        store.flushStore(columns)
+        step = last
 
-        # Store the light’s coordinates
-        lightXY = np.zeros(2)
-        lightXY[0] = light.x
-        lightXY[1] = light.y
+        state = {"lightX": lightX, "lightY": lightY, "occupancy": occupancy.counts, "occupancyOutside": occupancy.outside}
+        state.update({f"vehicles.{name}": value for name, value in vars(vehicles).items() if isinstance(value, np.ndarray)})
+        checkpoint.save(checkpointFile, {"run": run, "step": step, "rng": checkpoint.rngState(rng)}, state)
 
-        # Save results
-        np.save(f"history{i}.npy", history)
-        np.save(f"lightXY{i}.npy", lightXY)
+    saveOccupancy(columns, (), occupancy)
+    store.flushStore(columns)
+    checkpoint.remove(checkpointFile)
 
 def part1(population, duration, numTypes):
-    # Make sure to use part 1 turning for the random vehicles
+    # Part 1 turning (any angle) for the random vehicles
+    agent.RandomWalker.turning = "continuous"
     runRandom(population, duration, numTypes)
 
 def part2(population, duration, numTypes):
-    # Make sure to use part 2 turning for the random vehicles
+    # Part 2 turning (grid-like) for the random vehicles
+    agent.RandomWalker.turning = "grid"
     runRandom(population, duration, numTypes)
 
 def part3(duration, numLights):
@@ -173,10 +1092,13 @@ numTypes = 3 # Change to 1 for part 1 and 3 for part 2
 
 numLights = 10
 
-# Uncomment the part that you want to run
+# Uncomment the part that you want to run. Only runs when sim.py is the
+# script, so importing it (e.g. from visualize.py or experiment.py) never
+# starts a simulation.
 
-# part1(population, duration, numTypes) # Make sure to use part 1 turning for the random vehicles
+if __name__ == "__main__":
+    # part1(population, duration, numTypes) # Uses part 1 turning for the random vehicles
 
-# part2(population, duration, numTypes) # Make sure to use part 2 turning for the random vehicles
+    # part2(population, duration, numTypes) # Uses part 2 turning for the random vehicles
 
-part3(duration, numLights) # Can use thinkWorldWide() instead for 10,000 steps for World-Wide movement
\ No newline at end of file
+    part3(duration, numLights) # Can use thinkWorldWide() instead for 10,000 steps for World-Wide movement
\ No newline at end of file
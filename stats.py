@@ -0,0 +1,221 @@
+import numpy as np
+from statistics import NormalDist
+
+class RunningStats():
+    def __init__(self, shape=()):
+        # Running count, mean, variance (Welford / Chan), min and max for
+        # every channel of the given shape, e.g. one channel per time step.
+        self.count = np.zeros(shape, dtype=np.int64)
+        self.mean = np.zeros(shape)
+        self.m2 = np.zeros(shape) # Sum of squared differences from the mean
+        self.min = np.full(shape, np.inf)
+        self.max = np.full(shape, -np.inf)
+
+    def add(self, values, index=Ellipsis):
+        # Adds a batch of samples along the first axis of values to the
+        # channels selected by index (all channels by default).
+        values = np.asarray(values, dtype=float)
+        if len(values) == 0:
+            return
+        self.combine(index, len(values), values.mean(axis=0), ((values - values.mean(axis=0))**2).sum(axis=0), values.min(axis=0), values.max(axis=0))
+
+    def combine(self, index, count, mean, m2, low, high):
+        # Chan et al. merge of a batch summary into the selected channels
+        total = self.count[index] + count
+        delta = mean - self.mean[index]
+        self.mean[index] = self.mean[index] + delta*count/total
+        self.m2[index] = self.m2[index] + m2 + delta**2*self.count[index]*count/total
+        self.count[index] = total
+        self.min[index] = np.minimum(self.min[index], low)
+        self.max[index] = np.maximum(self.max[index], high)
+
+    def merge(self, other):
+        # Folds in the statistics of another accumulator (e.g. from a worker)
+        seen = other.count > 0
+        if np.ndim(seen) == 0:
+            if seen:
+                self.combine(Ellipsis, other.count, other.mean, other.m2, other.min, other.max)
+        elif seen.any():
+            self.combine(seen, other.count[seen], other.mean[seen], other.m2[seen], other.min[seen], other.max[seen])
+
+    def variance(self, ddof=0):
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(self.count > ddof, self.m2 / (self.count - ddof), np.nan)
+
+    def std(self, ddof=0):
+        return np.sqrt(self.variance(ddof))
+
+    def halfWidth(self, confidence=0.95):
+        # Half-width of the normal confidence interval on every channel's
+        # mean (nan below two samples). Adaptive runs only stop after
+        # several batches, so the normal quantile stands in for Student's t.
+        z = NormalDist().inv_cdf(0.5 + confidence/2)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return z*self.std(ddof=1)/np.sqrt(self.count)
+
+    def precise(self, tolerance=0.0, relative=0.0, confidence=0.95):
+        # Whether every channel's confidence interval is within tolerance,
+        # or within relative × |mean|, of the mean
+        return bool(np.all(self.halfWidth(confidence) <= np.maximum(tolerance, relative*np.abs(self.mean))))
+
+
+class QuantileSketch():
+    def __init__(self, shape=(), accuracy=0.01, minValue=1e-2, maxValue=1e8):
+        # Mergeable quantile sketch with logarithmic buckets: every
+        # non-negative value is kept to within the given relative accuracy.
+        # Values at or below minValue are reported as 0, values above
+        # maxValue are reported as maxValue.
+        self.gamma = (1 + accuracy)/(1 - accuracy)
+        self.minValue = minValue
+        self.maxValue = maxValue
+        self.buckets = int(np.ceil(np.log(maxValue/minValue)/np.log(self.gamma))) + 2
+        self.counts = np.zeros(shape + (self.buckets,), dtype=np.int64)
+
+    def bucket(self, values):
+        # Bucket 0 holds values <= minValue, the last bucket values above maxValue
+        with np.errstate(divide="ignore"):
+            index = np.ceil(np.log(np.maximum(values, self.minValue)/self.minValue)/np.log(self.gamma))
+        return np.clip(index, 0, self.buckets - 1).astype(np.int64)
+
+    def add(self, values, index=Ellipsis):
+        # Adds a batch of samples along the first axis of values to the
+        # channels selected by index (all channels by default).
+        values = np.asarray(values, dtype=float)
+        counts = self.counts[index]
+        channels = counts.reshape(-1, self.buckets)
+        flat = self.bucket(values).reshape(len(values), -1)
+        np.add.at(channels, (np.broadcast_to(np.arange(channels.shape[0]), flat.shape), flat), 1)
+        self.counts[index] = channels.reshape(counts.shape)
+
+    def merge(self, other):
+        self.counts += other.counts
+
+    def quantile(self, q):
+        # Approximate q-quantile of every channel (nan where there is no data)
+        cumulative = np.cumsum(self.counts, axis=-1)
+        total = cumulative[..., -1:]
+        rank = np.floor(q*(total - 1)) + 1
+        index = np.argmax(cumulative >= rank, axis=-1)
+
+        value = self.minValue*2*self.gamma**index/(self.gamma + 1)
+        value = np.where(index == 0, 0.0, np.minimum(value, self.maxValue))
+        return np.where(total[..., 0] > 0, value, np.nan)
+
+
+class PopulationStats():
+    def __init__(self, duration, quantileEvery=0):
+        # Summaries of a walker population collected while it runs:
+        # per-time-step displacement statistics, plus exploration and final
+        # displacement statistics and quantile sketches. With quantileEvery
+        # set, displacement quantiles are also sketched every that many steps.
+        self.displacement = RunningStats(duration + 1)
+        self.exploration = RunningStats()
+        self.finalDisplacement = RunningStats()
+        self.explorationSketch = QuantileSketch()
+        self.finalSketch = QuantileSketch()
+
+        self.quantileEvery = quantileEvery
+        self.displacementSketch = None
+        if quantileEvery:
+            self.displacementSketch = QuantileSketch((duration // quantileEvery + 1,))
+
+    def addDisplacement(self, step, values):
+        # Displacements of every bot at one time step
+        self.displacement.add(values, step)
+        if self.quantileEvery and step % self.quantileEvery == 0:
+            self.displacementSketch.add(values, step // self.quantileEvery)
+        if step == len(self.displacement.mean) - 1:
+            self.finalDisplacement.add(values)
+            self.finalSketch.add(values)
+
+    def addExploration(self, values):
+        # Explorations of a batch of finished bots
+        self.exploration.add(values)
+        self.explorationSketch.add(values)
+
+    def merge(self, other):
+        self.displacement.merge(other.displacement)
+        self.exploration.merge(other.exploration)
+        self.finalDisplacement.merge(other.finalDisplacement)
+        self.explorationSketch.merge(other.explorationSketch)
+        self.finalSketch.merge(other.finalSketch)
+        if self.displacementSketch is not None and other.displacementSketch is not None:
+            self.displacementSketch.merge(other.displacementSketch)
+
+    def summary(self):
+        # Plain dictionary of the collected statistics
+        result = {
+            "meanDisplacement": self.displacement.mean,
+            "stdDisplacement": self.displacement.std(),
+            "minDisplacement": self.displacement.min,
+            "maxDisplacement": self.displacement.max,
+        }
+        for name, running, sketch in (("Exploration", self.exploration, self.explorationSketch), ("FinalDisplacement", self.finalDisplacement, self.finalSketch)):
+            result[f"mean{name}"] = float(running.mean)
+            result[f"std{name}"] = float(running.std())
+            result[f"min{name}"] = float(running.min)
+            result[f"max{name}"] = float(running.max)
+            result[f"median{name}"] = float(sketch.quantile(0.5))
+        if self.displacementSketch is not None:
+            result["medianDisplacement"] = self.displacementSketch.quantile(0.5)
+        return result
+
+
+
+class OccupancyGrid():
+    def __init__(self, extent, bins=256, windows=1, duration=None, center=(0.0, 0.0)):
+        # Fixed-memory 2D histogram of the positions visited inside the
+        # square of half-width extent around center, split into bins × bins
+        # cells. With windows > 1 the run (duration steps) is split into
+        # that many equal time windows, each with its own histogram.
+        # Positions outside the square are only counted.
+        self.extent = extent
+        self.bins = bins
+        self.windows = windows
+        self.duration = duration
+        self.center = (float(center[0]), float(center[1]))
+        self.counts = np.zeros((windows, bins, bins), dtype=np.int64)
+        self.outside = np.zeros(windows, dtype=np.int64)
+
+    def layout(self):
+        # Arguments that create an empty grid of the same shape
+        return (self.extent, self.bins, self.windows, self.duration, self.center)
+
+    def bounds(self):
+        # (xMin, xMax, yMin, yMax) of the counted square
+        x, y = self.center
+        return (x - self.extent, x + self.extent, y - self.extent, y + self.extent)
+
+    def add(self, x, y, step=0):
+        # Counts the positions (x, y), visited at the given time step(s)
+        x = np.asarray(x, dtype=float)
+        window = np.broadcast_to(np.asarray(step)*self.windows // (self.duration + 1) if self.windows > 1 else 0, x.shape).ravel()
+        x = x.ravel()
+        y = np.asarray(y, dtype=float).ravel()
+
+        scale = self.bins/(2*self.extent)
+        i = np.floor((x - self.center[0] + self.extent)*scale)
+        j = np.floor((y - self.center[1] + self.extent)*scale)
+        inside = (i >= 0) & (i < self.bins) & (j >= 0) & (j < self.bins)
+
+        flat = (window[inside]*self.bins + i[inside].astype(np.int64))*self.bins + j[inside].astype(np.int64)
+        np.add.at(self.counts.reshape(-1), flat, 1)
+        np.add.at(self.outside, window[~inside], 1)
+
+    def addHistory(self, xHistory, yHistory):
+        # Counts whole histories, time steps along the last axis
+        xHistory = np.asarray(xHistory)
+        self.add(xHistory, yHistory, np.broadcast_to(np.arange(xHistory.shape[-1]), xHistory.shape))
+
+    def merge(self, other):
+        # Folds in the counts of another grid with the same layout
+        self.counts += other.counts
+        self.outside += other.outside
+
+    def density(self, window=None):
+        # Fraction of all counted positions in every cell, for one time
+        # window or all of them together
+        counts = self.counts.sum(axis=0) if window is None else self.counts[window]
+        outside = self.outside.sum() if window is None else self.outside[window]
+        total = counts.sum() + outside
+        return counts/total if total else counts.astype(float)
\ No newline at end of file
@@ -0,0 +1,130 @@
+import json
+import os
+import gridpaths
+import numpy as np
+
+# Layout of a result store: one directory per experiment holding a
+# meta.json file plus one fixed-shape .npy file per column, e.g.
+#
+#   randomResults/meta.json
+#   randomResults/x.npy              numTypes × population × (duration + 1)
+#   randomResults/y.npy              numTypes × population × (duration + 1)
+#   randomResults/displacements.npy  numTypes × population × (duration + 1)
+#   randomResults/explorations.npy   numTypes × population
+#
+# Runs may add further columns, e.g. occupancy grids (numTypes × windows ×
+# bins × bins) with their layout under "occupancy" in meta.json.
+#
+# A compact random store ("compact" in meta.json) replaces x, y and
+# displacements with every path's start point, velocity and packed heading
+# codes (see gridpaths.py); Store decodes them whenever they are read.
+#
+# Plain .npy columns can be memory-mapped, so a single trajectory can be
+# read without loading the rest, and nothing is ever pickled.
+
+RANDOM_STORE = "randomResults"
+VEHICLE_STORE = "vehicleResults"
+
+def columnPath(path, name):
+    return os.path.join(path, f"{name}.npy")
+
+def createStore(path, columns, meta):
+    # Creates an empty store with the given columns (name → (shape, dtype))
+    # and metadata, returning writable memory-mapped arrays for each column.
+    os.makedirs(path, exist_ok=True)
+
+    meta = dict(meta)
+    meta["columns"] = {name: {"shape": list(shape), "dtype": dtype} for name, (shape, dtype) in columns.items()}
+    with open(os.path.join(path, "meta.json"), "w") as f:
+        json.dump(meta, f, indent=2)
+
+    arrays = {}
+    for name, (shape, dtype) in columns.items():
+        arrays[name] = np.lib.format.open_memmap(columnPath(path, name), mode="w+", dtype=dtype, shape=tuple(shape))
+    return arrays
+
+def openStore(path):
+    # Writable memory-mapped columns of an existing store, e.g. to finish
+    # a run that was interrupted
+    meta = readMeta(path)
+    return {name: np.lib.format.open_memmap(columnPath(path, name), mode="r+") for name in meta["columns"]}
+
+def flushStore(arrays):
+    # Makes sure everything written to the columns has reached the disk
+    for array in arrays.values():
+        array.flush()
+
+def readMeta(path):
+    with open(os.path.join(path, "meta.json")) as f:
+        return json.load(f)
+
+class Store():
+    def __init__(self, path, mmap=True):
+        # Read-only view of a store. Columns are memory-mapped by default,
+        # so indexing one trajectory only reads that trajectory from disk.
+        self.path = path
+        self.meta = readMeta(path)
+        self.columns = {}
+        for name in self.meta["columns"]:
+            self.columns[name] = np.load(columnPath(path, name), mmap_mode="r" if mmap else None)
+
+    def __getitem__(self, name):
+        if name not in self.columns and self.meta.get("compact") and name in ("x", "y", "displacements"):
+            return CompactColumn(self, name)
+        return self.columns[name]
+
+    def __contains__(self, name):
+        return name in self.columns or (self.meta.get("compact", False) and name in ("x", "y", "displacements"))
+
+    def decode(self, index):
+        # x and y histories of the compact paths selected by index
+        starts = self.columns["starts"][index]
+        return gridpaths.decode(starts[..., 0], starts[..., 1], self.columns["velocities"][index], self.columns["codes"][index], self.meta["duration"])
+
+    def decodeColumn(self, name, index):
+        # Rows selected by index of one decoded column ("x", "y" or
+        # "displacements") of a compact store
+        starts = self.columns["starts"][index]
+        velocities = self.columns["velocities"][index]
+        codes = self.columns["codes"][index]
+        steps = self.meta["duration"]
+        if name == "displacements":
+            x, y = gridpaths.decode(starts[..., 0], starts[..., 1], velocities, codes, steps)
+            return np.sqrt(x**2 + y**2)
+        axis = 0 if name == "x" else 1
+        return gridpaths.decodeAxis(starts[..., axis], velocities, codes, steps, axis)
+
+    def trajectory(self, *index):
+        # x and y histories of one bot or light trial, e.g. trajectory(t, r)
+        if self.meta.get("compact"):
+            return self.decode(index)
+        return self.columns["x"][index], self.columns["y"][index]
+
+
+class CompactColumn():
+    def __init__(self, results, name):
+        # Lazy view of a decoded column of a compact store, shaped like the
+        # full column (numTypes × population × (duration + 1)). Indexing it
+        # decodes only the rows asked for, so nothing is decoded up front.
+        self.results = results
+        self.name = name
+        self.shape = results.columns["velocities"].shape + (results.meta["duration"] + 1,)
+        self.ndim = len(self.shape)
+        self.dtype = np.dtype(float)
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __getitem__(self, index):
+        index = index if isinstance(index, tuple) else (index,)
+        if any(part is Ellipsis for part in index):
+            return self.results.decodeColumn(self.name, Ellipsis)[index]
+
+        # Leading indices pick rows, anything past them picks time steps
+        rows = index[:self.ndim - 1]
+        values = self.results.decodeColumn(self.name, rows)
+        return values[(Ellipsis,) + index[self.ndim - 1:]] if len(index) >= self.ndim else values
+
+    def __array__(self, dtype=None, copy=None):
+        values = self[...]
+        return values if dtype is None else values.astype(dtype)
\ No newline at end of file
@@ -0,0 +1,130 @@
+import argparse
+import copy
+import csv
+import itertools
+import os
+import time
+import agent
+import metrics
+import optimize
+import parallel
+import sim
+import stats
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+
+# Gains of a vehicle that the sweep leaves alone (see agent.BraitenbergBatch)
+DEFAULT_GAINS = {"sg": [1/10.0], "vk": [1.0], "tk": [1.0]}
+
+# Columns of the result table, in order
+COLUMNS = ["duration", "controller"] + optimize.GAINS + ["lights", "meanFitness", "stdFitness", "halfWidth", "halted", "meanHaltStep", "meanFinalDistance", "seconds"]
+
+def sweepGrid(durations, controllers=("think",), gains=None):
+    # Every combination of duration, controller and gains (name → values
+    # tried, defaults for the gains not given), as one dict per grid point
+    gains = dict(DEFAULT_GAINS, **(gains or {}))
+    points = []
+    for duration, controller, values in itertools.product(durations, controllers, itertools.product(*(gains[name] for name in optimize.GAINS))):
+        point = {"duration": duration, "controller": controller}
+        point.update(zip(optimize.GAINS, values))
+        points.append(point)
+    return points
+
+def trials(duration, numLights, seed):
+    # Light placements and starting vehicles shared by every grid point of
+    # a duration. Trial i draws from its own random stream, the one
+    # parallel.vehicleTask uses, so a sweep point with the default gains
+    # reproduces parallel.simVehicleParallel, and every duration draws
+    # from the same streams.
+    size = int(np.sqrt(duration))
+    lightX = np.zeros(numLights, dtype=int)
+    lightY = np.zeros(numLights, dtype=int)
+    vehicles = []
+
+    for i in range(numLights):
+        rng = parallel.taskRng(seed, parallel.VEHICLE_STREAM, i)
+        x, y = agent.placeLights(1, size, rng)
+        lightX[i] = x[0]
+        lightY[i] = y[0]
+        vehicles.append(agent.BraitenbergBatch(1, rng))
+
+    return lightX, lightY, agent.BraitenbergBatch.concatenate(vehicles)
+
+def sweepTask(point, lightX, lightY, vehicles):
+    # Runs the light trials of one grid point, returning its table row
+    start = time.perf_counter()
+    vehicles = copy.deepcopy(vehicles)
+    for name in optimize.GAINS:
+        setattr(vehicles, name, np.full(len(vehicles), point[name], dtype=float))
+
+    xHistory, yHistory, convergedAt = sim.simVehicleBatched(vehicles, point["duration"], lightX, lightY, point["controller"], report=True)
+
+    fitness = stats.RunningStats()
+    fitness.add(metrics.fitnessScores(xHistory, yHistory, lightX, lightY))
+    halted = convergedAt >= 0
+
+    row = dict(point)
+    row.update({
+        "lights": len(lightX),
+        "meanFitness": float(fitness.mean),
+        "stdFitness": float(fitness.std()),
+        "halfWidth": float(fitness.halfWidth()),
+        "halted": float(halted.mean()),
+        "meanHaltStep": float(convergedAt[halted].mean()) if halted.any() else np.nan,
+        "meanFinalDistance": float(np.sqrt((xHistory[:, -1] - lightX)**2 + (yHistory[:, -1] - lightY)**2).mean()),
+        "seconds": time.perf_counter() - start,
+    })
+    return row
+
+def runSweep(durations, controllers=("think",), gains=None, numLights=10, seed=0, workers=None):
+    # Runs every grid point of sweepGrid as one job on a process pool and
+    # returns the result table, one row per point in grid order. Lights
+    # and starting vehicles are drawn once per duration and shared by all
+    # of its points (common random numbers). Points are submitted longest
+    # first (a run costs about duration × numLights steps), so the long
+    # runs do not end up alone at the tail.
+    workers = workers or os.cpu_count()
+    points = sweepGrid(durations, controllers, gains)
+    shared = {duration: trials(duration, numLights, seed) for duration in set(durations)}
+    order = sorted(range(len(points)), key=lambda i: points[i]["duration"], reverse=True)
+
+    if workers == 1:
+        rows = {i: sweepTask(points[i], *shared[points[i]["duration"]]) for i in order}
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {i: pool.submit(sweepTask, points[i], *shared[points[i]["duration"]]) for i in order}
+            rows = {i: future.result() for i, future in futures.items()}
+
+    return [rows[i] for i in range(len(points))]
+
+def writeTable(rows, path):
+    # Saves the result table as CSV
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=COLUMNS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+def printTable(rows):
+    print(" ".join(f"{name:>12}" for name in COLUMNS))
+    for row in rows:
+        print(" ".join(f"{row[name]:>12.4g}" if isinstance(row[name], float) else f"{row[name]:>12}" for name in COLUMNS))
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep vehicle runs over durations, gains and controllers")
+    parser.add_argument("--durations", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--controllers", nargs="+", default=["think"], choices=["think", "thinkWorldTravel"])
+    for name in optimize.GAINS:
+        parser.add_argument(f"--{name}", type=float, nargs="+", default=DEFAULT_GAINS[name])
+    parser.add_argument("--lights", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--output", default="sweep.csv")
+    args = parser.parse_args()
+
+    gains = {name: getattr(args, name) for name in optimize.GAINS}
+    rows = runSweep(args.durations, args.controllers, gains, args.lights, args.seed, args.workers)
+    writeTable(rows, args.output)
+    printTable(rows)
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
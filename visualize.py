@@ -1,6 +1,11 @@
 import matplotlib.pyplot as plt
+import metrics
 import numpy as np
+import pipeline
+import render
 import sim
+import stats
+import store
 
 
 # -----------------------------
@@ -11,19 +16,11 @@ def findExploredRandom(histories, explorations):
     results = []
 
     for t in range(sim.numTypes):
-        type_values = []
-        for r in range(sim.population):
-            x = histories[t][r].xHistory
-            y = histories[t][r].yHistory
-
-            x_range = max(x) - min(x)
-            y_range = max(y) - min(y)
-
-            size = (x_range * (y_range + 1)) + (y_range * (x_range + 1))
-
-            type_values.append(explorations[t][r] / size)
+        # Every bot of the type at once, see metrics.coverageRatios
+        x = np.array([histories[t][r].xHistory for r in range(sim.population)])
+        y = np.array([histories[t][r].yHistory for r in range(sim.population)])
 
-        results.append(type_values)
+        results.append(metrics.coverageRatios(x, y, np.asarray(explorations[t][:sim.population])))
 
     return results
 
@@ -48,15 +45,27 @@ def showPathRandom(histories, displacements):
             plt.show()
 
 
-def showAverageDisplacementRandom(displacements):
+def showPopulationRandom(histories):
+    # One window per walker type with every bot drawn together as a single
+    # decimated line collection (see render.py for headless output)
     for t in range(sim.numTypes):
-        avg_vals = []
+        x = np.array([history.xHistory for history in histories[t]])
+        y = np.array([history.yHistory for history in histories[t]])
+
+        render.drawPaths(plt.gca(), x, y)
+
+        plt.xlabel("x")
+        plt.ylabel("y")
+        plt.title(f"Type {t + 1} Robot Movement")
+        plt.show()
 
-        for time in range(sim.duration + 1):
-            total = sum(displacements[t][r][time] for r in range(sim.population))
-            avg_vals.append(total / sim.population)
 
-        plt.plot(avg_vals)
+def showAverageDisplacementRandom(displacements):
+    for t in range(sim.numTypes):
+        running = stats.RunningStats(len(displacements[t][0]))
+        running.add(displacements[t])
+
+        plt.plot(running.mean)
         plt.xlabel("Time")
         plt.ylabel("Average Displacement")
         plt.title(f"Type {t + 1} Robot Average Displacement")
@@ -86,6 +95,30 @@ def showHistogramRandom(explores):
     plt.show()
 
 
+def showDisplacementStats(summaries):
+    # Plots mean ± standard deviation displacement straight from the
+    # accumulators returned by sim.simPopulationStats
+    for t, summary in enumerate(summaries):
+        mean = summary.displacement.mean
+        std = summary.displacement.std()
+
+        plt.plot(mean)
+        plt.fill_between(np.arange(len(mean)), mean - std, mean + std, alpha=0.3)
+        plt.xlabel("Time")
+        plt.ylabel("Average Displacement")
+        plt.title(f"Type {t + 1} Robot Average Displacement")
+        plt.show()
+
+
+def showOccupancy(grid, title="Occupancy", window=None):
+    # Density map of a stats.OccupancyGrid, e.g. from readOccupancy
+    render.drawOccupancy(plt.gca(), grid, window)
+    plt.xlabel("x")
+    plt.ylabel("y")
+    plt.title(title)
+    plt.show()
+
+
 def printStatsRandom(explores):
     for t in range(sim.numTypes):
         values = explores[t]
@@ -101,28 +134,80 @@ def printStatsRandom(explores):
 # Reading Data
 # -----------------------------
 
-def readRandom():
+def readRandom(path=store.RANDOM_STORE):
+    # Columns are memory-mapped, so only the trajectories that get used
+    # are actually read from disk
+    results = store.Store(path)
     histories = []
-    displacements = []
-    explorations = []
 
-    for t in range(sim.numTypes):
-        histories.append(np.load(f"histories{t}.npy", allow_pickle=True))
-        displacements.append(np.load(f"displacements{t}.npy", allow_pickle=True))
-        explorations.append(np.load(f"explorations{t}.npy", allow_pickle=True))
+    for t in range(results.meta["numTypes"]):
+        histories.append([readHistory(results, (t, r)) for r in range(results.meta["population"])])
 
-    return histories, displacements, explorations
+    return histories, results["displacements"], results["explorations"]
 
 
-def readVehicle():
-    history = []
-    lightXY = []
+def readHistory(results, index):
+    # History of one bot of an open store. Paths of a compact store stay
+    # packed and are decoded one axis at a time when first read.
+    if results.meta.get("compact"):
+        start = results["starts"][index]
+        return sim.CompactHistory(float(start[0]), float(start[1]), float(results["velocities"][index]), results["codes"][index], results.meta["duration"])
+    return sim.History(*results.trajectory(*index))
+
+
+def readOccupancy(path, index=()):
+    # Occupancy grid saved with a run, e.g. readOccupancy(store.RANDOM_STORE, t)
+    return render.readOccupancy(store.Store(path), index)
+
+
+def readVehicle(path=store.VEHICLE_STORE):
+    results = store.Store(path)
+    history = [sim.History(*results.trajectory(i)) for i in range(results.meta["numLights"])]
+
+    return history, results["lights"]
 
-    for i in range(sim.numLights):
-        history.append(np.load(f"history{i}.npy", allow_pickle=True).item())
-        lightXY.append(np.load(f"lightXY{i}.npy", allow_pickle=True))
 
-    return history, lightXY
+def streamTrials(path, depth=2):
+    # Yields (index, History) for every bot of a random store, index
+    # (t, r), or every light trial of a vehicle store, index (i,). The
+    # next depth trials are read in a background thread while the current
+    # one is being looked at.
+    results = store.Store(path)
+    if results.meta["kind"] == "random":
+        keys = [(t, r) for t in range(results.meta["numTypes"]) for r in range(results.meta["population"])]
+    else:
+        keys = [(i,) for i in range(results.meta["numLights"])]
+
+    def load(index):
+        x, y = results.trajectory(*index)
+        return sim.History(np.array(x), np.array(y))
+
+    yield from pipeline.prefetch(load, keys, depth)
+
+
+def showPathStore(path):
+    # showPathRandom / showPathVehicle for a whole store, one trial at a
+    # time, with the next trials prefetched while a window is open
+    results = store.Store(path)
+    for index, history in streamTrials(path):
+        x = history.xHistory
+        y = history.yHistory
+
+        if "lights" in results:
+            lx, ly = results["lights"][index]
+            plt.plot(lx, ly, 'mo')  # Light source
+            title = f"Vehicle {index[0] + 1} Path"
+        else:
+            title = f"Type {index[0] + 1} Robot {index[1] + 1} Movement"
+
+        plt.plot(x, y)
+        plt.plot(x[0], y[0], 'ro')   # Start
+        plt.plot(x[-1], y[-1], 'ko') # End
+
+        plt.xlabel("x")
+        plt.ylabel("y")
+        plt.title(title)
+        plt.show()
 
 
 # -----------------------------
@@ -229,6 +314,7 @@ def part3Visualize():
 
 
 # Choose what to run
-# part1Visualize()
-# part2Visualize()
-part3Visualize()
\ No newline at end of file
+if __name__ == "__main__":
+    # part1Visualize()
+    # part2Visualize()
+    part3Visualize()
\ No newline at end of file